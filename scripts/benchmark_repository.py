@@ -0,0 +1,244 @@
+"""
+Benchmark NoticeRepository bulk load and read throughput on a scratch SQLite database.
+
+Also compares on-disk size and payload scan time of the legacy JSON-column layout
+against compressed storage, by migrating a legacy database in place.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import JSON, MetaData, create_engine, insert, select, text
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from src.migrations import MIGRATIONS  # noqa: E402
+from src.models import Notice, NoticeCountry, NoticeDocument, NoticeUNSPSC  # noqa: E402
+from src.repository import DEFAULT_UPSERT_BATCH_SIZE, NoticeRepository  # noqa: E402
+
+AGENCIES = ["UNDP", "UNICEF", "WFP", "UNHCR", "WHO", "FAO", "UNOPS"]
+COUNTRIES = [("KEN", "Kenya"), ("UGA", "Uganda"), ("GHA", "Ghana"), ("FJI", "Fiji"), ("NGA", "Nigeria")]
+COMPRESSION_MIGRATION = "0003_compress_cold_columns"
+TYPES = ["Request for proposal", "Invitation to bid", "Request for EOI"]
+
+
+def synthetic_notice(index: int, rng: random.Random, embedding_dim: int) -> Notice:
+    notice_id = f"BENCH-{index:07d}"
+    countries = rng.sample(COUNTRIES, k=rng.randint(1, 3))
+    raw = {
+        "id": notice_id,
+        "title": f"Technical assistance package {index}",
+        "description": " ".join(rng.choice(["policy", "audit", "finance", "health", "reform"]) for _ in range(200)),
+        "countries": [{"countryCode": code, "country": name} for code, name in countries],
+    }
+    notice = Notice(
+        id=notice_id,
+        title=raw["title"],
+        summary=raw["description"][:200],
+        description=raw["description"],
+        procurement_category="Services",
+        procurement_type=rng.choice(TYPES),
+        agency=rng.choice(AGENCIES),
+        deadline=date.today() + timedelta(days=rng.randint(-30, 90)),
+        publish_date=datetime.utcnow() - timedelta(days=rng.randint(0, 30)),
+        status="Published",
+        budget_min=rng.randint(10, 500) * 1000,
+        budget_max=rng.randint(500, 5000) * 1000,
+        currency="USD",
+        raw_json=raw,
+        fit_score=rng.randint(0, 100),
+        search_embedding=[rng.random() for _ in range(embedding_dim)],
+    )
+    notice.documents = [
+        NoticeDocument(notice_id=notice_id, url=f"https://example.org/{notice_id}/{n}.pdf", name=f"Annex {n}", type="pdf")
+        for n in range(rng.randint(0, 3))
+    ]
+    notice.unspsc = [NoticeUNSPSC(notice_id=notice_id, code="80101500", description="Business consulting")]
+    notice.countries = [
+        NoticeCountry(notice_id=notice_id, country_code=code, country_name=name) for code, name in countries
+    ]
+    return notice
+
+
+def rescore(notices: List[Notice], rng: random.Random) -> None:
+    """Change every notice's score so the next upsert has real work to do."""
+    for notice in notices:
+        notice.fit_score = (notice.fit_score + rng.randint(1, 100)) % 101
+
+
+def timed(label: str, func: Callable[[], int]) -> Dict[str, float]:
+    started = time.perf_counter()
+    count = func()
+    seconds = time.perf_counter() - started
+    rate = count / seconds if seconds else 0.0
+    print(f"{label:<44} {count:>8} rows  {seconds:8.3f}s  {rate:10.0f} rows/sec")
+    return {"rows": count, "seconds": seconds}
+
+
+def concurrent_reads(repository: NoticeRepository, notices: List[Notice], batch_size: int) -> None:
+    """Time full-table reads while a writer keeps re-upserting, to exercise WAL concurrency."""
+    stop = threading.Event()
+    reads: List[float] = []
+    errors: List[BaseException] = []
+
+    def reader() -> None:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                repository.fetch_all()
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+                return
+            reads.append(time.perf_counter() - started)
+
+    rescore(notices, random.Random(len(notices)))
+    thread = threading.Thread(target=reader, name="benchmark-reader")
+    thread.start()
+    started = time.perf_counter()
+    repository.upsert_notices(notices, batch_size=batch_size)
+    write_seconds = time.perf_counter() - started
+    stop.set()
+    thread.join()
+    if errors:
+        print(f"Concurrent reads failed: {errors[0]}")
+        return
+    average = sum(reads) / len(reads) if reads else 0.0
+    print(
+        f"{'re-upsert with concurrent reader':<44} {len(notices):>8} rows  {write_seconds:8.3f}s  "
+        f"{len(reads)} reads, avg {average * 1000:.1f} ms"
+    )
+
+
+def scan_payloads(engine, table) -> int:
+    """Read and decode raw_json and search_embedding for every notice."""
+    with engine.connect() as connection:
+        rows = connection.execute(select(table.c.raw_json, table.c.search_embedding)).all()
+    return sum(1 for raw_json, embedding in rows if raw_json is not None and embedding is not None)
+
+
+def database_bytes(engine, path: Path) -> int:
+    """On-disk size of the database, after checkpointing so the WAL holds no pages that belong in it."""
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    wal = path.with_name(f"{path.name}-wal")
+    return path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)
+
+
+def column_bytes(engine, table) -> Dict[str, int]:
+    """Stored bytes of the raw_json and search_embedding columns across all notices."""
+    with engine.connect() as connection:
+        row = connection.execute(
+            select(
+                text("COALESCE(SUM(LENGTH(CAST(raw_json AS BLOB))), 0)"),
+                text("COALESCE(SUM(LENGTH(CAST(search_embedding AS BLOB))), 0)"),
+            ).select_from(table)
+        ).one()
+    return {"raw_json": row[0], "search_embedding": row[1]}
+
+
+def storage_comparison(notices: List[Notice], scratch: Path) -> None:
+    """
+    Load notices into the legacy JSON layout, then apply just the compression
+    migration to that database, so both sizes have the same tables and indexes.
+
+    Embeddings are stored as float32 after the migration, so they lose precision
+    compared with the JSON floats; the largest difference is reported.
+    """
+    path = scratch / "storage.db"
+    legacy_engine = create_engine(f"sqlite:///{path}", future=True)
+    legacy = Notice.__table__.to_metadata(MetaData())
+    legacy.c.raw_json.type = JSON()
+    legacy.c.search_embedding.type = JSON()
+    legacy.create(legacy_engine)
+    with legacy_engine.begin() as connection:
+        connection.execute(
+            insert(legacy),
+            [{column.name: getattr(notice, column.name) for column in legacy.columns} for notice in notices],
+        )
+    with legacy_engine.connect() as connection:
+        connection.execute(text("VACUUM"))
+    before_bytes = database_bytes(legacy_engine, path)
+    before_columns = column_bytes(legacy_engine, legacy)
+    before = timed("payload scan (legacy JSON)", lambda: scan_payloads(legacy_engine, legacy))
+
+    # Only the compression migration runs: the others add indexes and the FTS
+    # table, which would make the size difference more than compression.
+    started = time.perf_counter()
+    with legacy_engine.begin() as connection:
+        dict(MIGRATIONS)[COMPRESSION_MIGRATION](Operations(MigrationContext.configure(connection)), connection)
+    print(f"{'migration to compressed columns':<44} {len(notices):>8} rows  {time.perf_counter() - started:8.3f}s")
+    with legacy_engine.connect() as connection:
+        connection.execute(text("VACUUM"))
+    after_bytes = database_bytes(legacy_engine, path)
+    after_columns = column_bytes(legacy_engine, Notice.__table__)
+    after = timed("payload scan (compressed)", lambda: scan_payloads(legacy_engine, Notice.__table__))
+    with legacy_engine.connect() as connection:
+        stored = dict(connection.execute(select(Notice.__table__.c.id, Notice.__table__.c.search_embedding)).all())
+    legacy_engine.dispose()
+    max_error = max(
+        (abs(a - b) for notice in notices for a, b in zip(notice.search_embedding, stored[notice.id])),
+        default=0.0,
+    )
+
+    print(f"Database size: {before_bytes / 1e6:.1f} MB -> {after_bytes / 1e6:.1f} MB (zlib)")
+    for column in ("raw_json", "search_embedding"):
+        print(
+            f"  {column:<18} {before_columns[column] / 1e6:8.1f} MB -> {after_columns[column] / 1e6:8.1f} MB "
+            f"({before_columns[column] / max(after_columns[column], 1):.1f}x smaller)"
+        )
+    print(f"Embedding precision: float32, max abs difference {max_error:.2e} from the JSON floats")
+    print(f"Payload scan {before['seconds']:.3f}s -> {after['seconds']:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark NoticeRepository on SQLite")
+    parser.add_argument("--notices", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_UPSERT_BATCH_SIZE)
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument("--reads", type=int, default=5, help="Full-table reads to time")
+    parser.add_argument("--db", default=None, help="Database URL (default: scratch SQLite file)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    notices = [synthetic_notice(index, rng, args.embedding_dim) for index in range(args.notices)]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        db_url = args.db or f"sqlite:///{Path(scratch) / 'benchmark.db'}"
+        repository = NoticeRepository(db_url)
+        print(f"Database: {db_url} ({repository.dialect})")
+
+        timed("bulk load (insert)", lambda: sum(t.notices for t in repository.upsert_notices(notices, args.batch_size)))
+        timed("bulk load (unchanged)", lambda: sum(t.notices for t in repository.upsert_notices(notices, args.batch_size)))
+        rescore(notices, rng)
+        timed("bulk load (update)", lambda: sum(t.notices for t in repository.upsert_notices(notices, args.batch_size)))
+        sample = notices[: min(200, len(notices))]
+        rescore(sample, rng)
+        timed("per-notice upsert", lambda: sum(t.notices for t in repository.upsert_notices(sample, batch_size=1)))
+        timed(
+            f"fetch_all x{args.reads}",
+            lambda: sum(len(repository.fetch_all()) for _ in range(args.reads)),
+        )
+        timed(
+            f"iter_notices x{args.reads} (heavy columns deferred)",
+            lambda: sum(sum(1 for _ in repository.iter_notices()) for _ in range(args.reads)),
+        )
+        concurrent_reads(repository, notices, args.batch_size)
+        repository.engine.dispose()
+        if args.db is None:
+            storage_comparison(notices, Path(scratch))
+
+
+if __name__ == "__main__":
+    main()
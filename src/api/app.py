@@ -1,25 +1,249 @@
 from __future__ import annotations
 
 import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+from ..repository import DEFAULT_POOL_SIZE, NoticeFilters, NoticeRepository
+from ..run_report import DEFAULT_RUN_REPORT_PATH, read_run_report
+from .export import iter_csv, iter_ndjson
+from .index import DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT, OpportunityQuery, project, wants_embedding
+from .metrics import ENCODED_CACHE, REGISTRY, MetricsMiddleware, Sample, hit_ratio
+from .packed import DEFAULT_PACKED_PATH, PackedSnapshotCache
+from .snapshot import EncodedBody, NoticeSnapshot, NoticeSnapshotCache, RepositorySnapshotCache
+from .vectors import EmbeddingUnavailable, QueryEmbedder
+
+LOGGER = logging.getLogger(__name__)
 
 OUTPUT_PATH = Path("output/notices.json")
+PACKED_PATH = Path(os.getenv("NOTICES_SNAPSHOT_PATH", DEFAULT_PACKED_PATH))
+RUN_REPORT_PATH = Path(os.getenv("PIPELINE_REPORT_PATH", DEFAULT_RUN_REPORT_PATH))
+DEFAULT_DATABASE_URL = "sqlite:///data/notices.db"
 
+DEFAULT_SIMILAR_LIMIT = 10
+MAX_SIMILAR_LIMIT = 50
+# Query parameters that switch /opportunities from the full feed to a page.
+PAGED_PARAMS = frozenset(
+    {
+        "cursor",
+        "limit",
+        "sort",
+        "order",
+        "fields",
+        "agency",
+        "country",
+        "region",
+        "sector",
+        "procurementType",
+        "minScore",
+        "deadlineFrom",
+        "deadlineTo",
+    }
+)
 
-def _load_notices() -> List[Dict[str, Any]]:
-    if not OUTPUT_PATH.exists():
-        return []
+
+@lru_cache(maxsize=1)
+def _repository() -> NoticeRepository:
+    return NoticeRepository(
+        os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL),
+        pool_size=int(os.getenv("API_DB_POOL_SIZE", DEFAULT_POOL_SIZE)),
+        read_only=True,
+    )
+
+
+def _snapshot_source():
+    """
+    NOTICES_SOURCE=packed (default) maps the pipeline's packed snapshot, shared by
+    all workers, and falls back to the database while none has been published;
+    ``database`` skips the packed file and ``file`` serves only the JSON export
+    (e.g. when the API runs without the database).
+    """
+    source = os.getenv("NOTICES_SOURCE", "packed")
+    if source == "file":
+        return _FILE_SNAPSHOTS
+    database = RepositorySnapshotCache(_repository, fallback=_FILE_SNAPSHOTS)
+    if source == "database":
+        return database
+    return PackedSnapshotCache(PACKED_PATH, fallback=database)
+
+
+_FILE_SNAPSHOTS = NoticeSnapshotCache(OUTPUT_PATH)
+_SNAPSHOTS = _snapshot_source()
+_EMBEDDER = QueryEmbedder()
+
+
+def _notices_snapshot() -> NoticeSnapshot:
     try:
-        return json.loads(OUTPUT_PATH.read_text(encoding="utf-8"))
-    except json.JSONDecodeError as exc:
+        return _SNAPSHOTS.get()
+    except (OSError, json.JSONDecodeError) as exc:
         raise HTTPException(status_code=500, detail="Failed to parse notices file") from exc
 
 
-app = FastAPI(title="Procurement App API")
+async def _current_snapshot() -> NoticeSnapshot:
+    # Reloads hit the database or parse the export; keep them off the event loop.
+    if _SNAPSHOTS.needs_check():
+        return await run_in_threadpool(_notices_snapshot)
+    return _notices_snapshot()
+
+
+def _not_modified(request: Request, etag: str, mtime: Optional[int]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored.
+        return "*" in tags or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and mtime is not None:
+        try:
+            return mtime <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether Accept-Encoding allows gzip: listed (or covered by ``*``) with a non-zero q-value."""
+    qvalues: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding.lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qvalues:
+            return qvalues[coding] > 0
+    return False
+
+
+def _encoded_response(request: Request, body: EncodedBody, snapshot: NoticeSnapshot) -> Response:
+    headers = {"ETag": body.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if snapshot.last_modified:
+        headers["Last-Modified"] = snapshot.last_modified
+    if _not_modified(request, body.etag, snapshot.mtime):
+        return Response(status_code=304, headers=headers)
+    if _accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=body.gzipped, media_type="application/json", headers=headers)
+    return Response(content=body.raw, media_type="application/json", headers=headers)
+
+
+def _similarity_results(
+    snapshot: NoticeSnapshot,
+    hits: List[Tuple[str, float]],
+    fields: Optional[Tuple[str, ...]],
+) -> List[Dict[str, Any]]:
+    results = []
+    for notice_id, similarity in hits:
+        record = project(snapshot.index.get(notice_id, with_embedding=wants_embedding(fields)), fields)
+        record["similarity"] = round(similarity, 6)
+        results.append(record)
+    return results
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+
+
+_RUN_REPORT: Dict[str, Any] = {"key": None, "report": None}
+
+
+def _run_report() -> Optional[Dict[str, Any]]:
+    """The pipeline's last run report, re-read only when the file changes."""
+    try:
+        stat = RUN_REPORT_PATH.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+    if _RUN_REPORT["key"] != key:
+        _RUN_REPORT["report"] = read_run_report(str(RUN_REPORT_PATH))
+        _RUN_REPORT["key"] = key
+    return _RUN_REPORT["report"]
+
+
+def _cache_hit_ratios() -> List[Sample]:
+    samples = []
+    encoded = hit_ratio(ENCODED_CACHE.value(result="hit"), ENCODED_CACHE.value(result="miss"))
+    if encoded is not None:
+        samples.append(({"cache": "encoded_body"}, encoded))
+    info = _EMBEDDER.cache_info()
+    embedding = hit_ratio(info.hits, info.misses)
+    if embedding is not None:
+        samples.append(({"cache": "query_embedding"}, embedding))
+    return samples
+
+
+def _report_samples(section: str, label: str) -> List[Sample]:
+    report = _run_report() or {}
+    return [({label: name}, value) for name, value in sorted((report.get(section) or {}).items())]
+
+
+def _report_value(name: str) -> List[Sample]:
+    report = _run_report()
+    return [({}, report[name])] if report and report.get(name) is not None else []
+
+
+def _report_finished() -> List[Sample]:
+    report = _run_report()
+    if not report or not report.get("finished_at"):
+        return []
+    return [({}, datetime.fromisoformat(report["finished_at"]).timestamp())]
+
+
+REGISTRY.callback("api_cache_hit_ratio", "Hit ratio of the API's in-process caches.", _cache_hit_ratios)
+REGISTRY.callback(
+    "pipeline_last_run_timestamp_seconds", "When the last pipeline run finished (Unix time).", _report_finished
+)
+REGISTRY.callback(
+    "pipeline_last_run_duration_seconds",
+    "Wall time of the last pipeline run.",
+    lambda: _report_value("duration_seconds"),
+)
+REGISTRY.callback(
+    "pipeline_last_run_api_calls", "UNGM API requests made by the last pipeline run.", lambda: _report_value("api_calls")
+)
+REGISTRY.callback(
+    "pipeline_last_run_notices",
+    "Notices per stage in the last pipeline run (fetched, filtered, embedded, stored, ...).",
+    lambda: _report_samples("notices", "stage"),
+)
+REGISTRY.callback(
+    "pipeline_last_run_stage_duration_seconds",
+    "Time spent per stage in the last pipeline run.",
+    lambda: _report_samples("stages", "stage"),
+)
+
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Parse the feed and build its indexes and embedding matrix before the first request.
+    try:
+        _SNAPSHOTS.get()
+    except (OSError, json.JSONDecodeError) as exc:
+        LOGGER.warning("Notices snapshot not loaded at startup: %s", exc)
+    yield
+
+
+app = FastAPI(title="Procurement App API", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +252,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -43,7 +268,228 @@ async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+def _opportunity_filters(
+    agency: Optional[str] = Query(None, description="Comma-separated agencies"),
+    country: Optional[str] = Query(None, description="Comma-separated country codes or names"),
+    region: Optional[str] = Query(None, description="Comma-separated regions"),
+    sector: Optional[str] = Query(None, description="Comma-separated sectors"),
+    procurement_type: Optional[str] = Query(None, alias="procurementType", description="Comma-separated types"),
+    min_score: Optional[float] = Query(None, alias="minScore"),
+    deadline_from: Optional[date] = Query(None, alias="deadlineFrom"),
+    deadline_to: Optional[date] = Query(None, alias="deadlineTo"),
+) -> Dict[str, Any]:
+    """Filter parameters shared by the list, facet and export endpoints (OpportunityQuery.build keywords)."""
+    return {
+        "agency": agency,
+        "country": country,
+        "region": region,
+        "sector": sector,
+        "procurementType": procurement_type,
+        "min_score": min_score,
+        "deadline_from": deadline_from,
+        "deadline_to": deadline_to,
+    }
+
+
 @app.get("/opportunities")
-async def opportunities() -> Dict[str, List[Dict[str, Any]]]:
-    return {"notices": _load_notices()}
+async def opportunities(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    sort: Literal["totalScore", "deadline"] = "totalScore",
+    order: Optional[Literal["asc", "desc"]] = None,
+    filters: Dict[str, Any] = Depends(_opportunity_filters),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+) -> Response:
+    """
+    Without paging, filter, sort or ``fields`` parameters, the full feed (unchanged
+    for existing clients; unrelated parameters such as cache busters are ignored).
+    Otherwise one page of notices plus ``total`` and ``nextCursor``.
+    """
+    snapshot = await _current_snapshot()
+    if PAGED_PARAMS.isdisjoint(request.query_params):
+        return _encoded_response(request, snapshot.feed, snapshot)
+    try:
+        query = OpportunityQuery.build(
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            fields=fields,
+            **filters,
+        )
+        body = snapshot.encoded(("page", query.cache_key()), lambda: snapshot.index.query(query))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return _encoded_response(request, body, snapshot)
+
+
+@app.get("/notices/search")
+def search_notices(
+    q: str = Query(..., min_length=1, description="Free-text query"),
+    agency: Optional[str] = None,
+    country: Optional[str] = Query(None, description="Country code"),
+    min_score: Optional[int] = Query(None, alias="minScore"),
+    deadline_from: Optional[date] = Query(None, alias="deadlineFrom"),
+    deadline_to: Optional[date] = Query(None, alias="deadlineTo"),
+    limit: int = Query(20, ge=1, le=100),
+) -> Dict[str, Any]:
+    filters = NoticeFilters(
+        deadline_from=deadline_from,
+        deadline_to=deadline_to,
+        agency=agency,
+        country=country,
+        min_score=min_score,
+    )
+    hits = _repository().search(q, filters=filters, limit=limit)
+    return {"query": q, "results": [hit.to_dict() for hit in hits]}
+
+
+@app.get("/opportunities/search")
+def search_opportunities(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Free-text query, matched by embedding similarity"),
+    limit: int = Query(DEFAULT_SIMILAR_LIMIT, ge=1, le=MAX_SIMILAR_LIMIT),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+) -> Response:
+    snapshot = _notices_snapshot()
+    query = " ".join(q.split())
+    projected = OpportunityQuery.build(fields=fields).fields
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    def build() -> Dict[str, Any]:
+        vector = _EMBEDDER(query)
+        timings["embed"] = time.perf_counter() - started
+        hits = snapshot.embeddings.top_k(vector, limit)
+        timings["knn"] = time.perf_counter() - started - timings["embed"]
+        return {"query": query, "results": _similarity_results(snapshot, hits, projected)}
+
+    try:
+        body = snapshot.encoded(("search", query, limit, projected), build)
+    except EmbeddingUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    timings["total"] = time.perf_counter() - started
+    LOGGER.info("Semantic search %r: %s (%s)", query, _server_timing(timings), "miss" if "knn" in timings else "cached")
+    response = _encoded_response(request, body, snapshot)
+    response.headers["Server-Timing"] = _server_timing(timings)
+    return response
+
+
+@app.get("/opportunities/{notice_id}/similar")
+async def similar_opportunities(
+    request: Request,
+    notice_id: str,
+    limit: int = Query(DEFAULT_SIMILAR_LIMIT, ge=1, le=MAX_SIMILAR_LIMIT),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+) -> Response:
+    snapshot = await _current_snapshot()
+    if notice_id not in snapshot.index:
+        raise HTTPException(status_code=404, detail="Notice not found")
+    projected = OpportunityQuery.build(fields=fields).fields
+    started = time.perf_counter()
+    body = snapshot.encoded(
+        ("similar", notice_id, limit, projected),
+        lambda: {
+            "id": notice_id,
+            "results": _similarity_results(snapshot, snapshot.embeddings.similar(notice_id, limit), projected),
+        },
+    )
+    response = _encoded_response(request, body, snapshot)
+    response.headers["Server-Timing"] = _server_timing({"total": time.perf_counter() - started})
+    return response
+
+
+@app.get("/opportunities/facets")
+async def opportunity_facets(
+    request: Request,
+    filters: Dict[str, Any] = Depends(_opportunity_filters),
+) -> Response:
+    """Counts per agency, country, region, sector, procurement type and score band."""
+    snapshot = await _current_snapshot()
+    query = OpportunityQuery.build(**filters)
+    unfiltered = query.cache_key() == OpportunityQuery().cache_key()
+    body = snapshot.encoded(
+        ("facets", query.cache_key()),
+        lambda: snapshot.index.default_facets if unfiltered else snapshot.index.facets(query),
+    )
+    return _encoded_response(request, body, snapshot)
+
+
+def _export_query(
+    sort: Literal["totalScore", "deadline"],
+    order: Optional[str],
+    fields: Optional[str],
+    filters: Dict[str, Any],
+) -> OpportunityQuery:
+    try:
+        return OpportunityQuery.build(sort=sort, order=order, fields=fields, **filters)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _export_headers(snapshot: NoticeSnapshot, filename: str) -> Dict[str, str]:
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-cache"}
+    if snapshot.last_modified:
+        headers["Last-Modified"] = snapshot.last_modified
+    return headers
+
+
+@app.get("/opportunities/export.ndjson")
+async def export_ndjson(
+    sort: Literal["totalScore", "deadline"] = "totalScore",
+    order: Optional[Literal["asc", "desc"]] = None,
+    filters: Dict[str, Any] = Depends(_opportunity_filters),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+) -> StreamingResponse:
+    """Every matching notice, one JSON object per line, streamed in chunks."""
+    snapshot = await _current_snapshot()
+    query = _export_query(sort, order, fields, filters)
+    return StreamingResponse(
+        iter_ndjson(snapshot.index.iter_matches(query), query.fields),
+        media_type="application/x-ndjson",
+        headers=_export_headers(snapshot, "opportunities.ndjson"),
+    )
+
+
+@app.get("/opportunities/export.csv")
+async def export_csv(
+    sort: Literal["totalScore", "deadline"] = "totalScore",
+    order: Optional[Literal["asc", "desc"]] = None,
+    filters: Dict[str, Any] = Depends(_opportunity_filters),
+    fields: Optional[str] = Query(None, description="Comma-separated columns"),
+) -> StreamingResponse:
+    """Every matching notice as CSV rows, streamed in chunks."""
+    snapshot = await _current_snapshot()
+    query = _export_query(sort, order, fields, filters)
+    return StreamingResponse(
+        iter_csv(snapshot.index.iter_matches(query), query.fields),
+        media_type="text/csv; charset=utf-8",
+        headers=_export_headers(snapshot, "opportunities.csv"),
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    """Prometheus text exposition of request, cache and pipeline run metrics (per worker process)."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
+# Keep last: "/opportunities/{notice_id}" would otherwise capture fixed paths
+# such as "/opportunities/search" declared after it.
+@app.get("/opportunities/{notice_id}")
+async def opportunity(
+    request: Request,
+    notice_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+) -> Response:
+    snapshot = await _current_snapshot()
+    projected = OpportunityQuery.build(fields=fields).fields
+    record = snapshot.index.get(notice_id, with_embedding=projected is None or wants_embedding(projected))
+    if record is None:
+        raise HTTPException(status_code=404, detail="Notice not found")
+    body = snapshot.encoded(
+        ("notice", notice_id, projected),
+        lambda: project(record, projected) if projected else record,
+    )
+    return _encoded_response(request, body, snapshot)
@@ -0,0 +1,86 @@
+"""Chunked NDJSON and CSV encoders for streaming notice exports."""
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+from .index import project
+
+CHUNK_SIZE = 64 * 1024
+CSV_DEFAULT_FIELDS = (
+    "id",
+    "title",
+    "agency",
+    "procurementType",
+    "countries",
+    "region",
+    "sector",
+    "deadline",
+    "totalScore",
+    "structuredScore",
+    "semanticScore",
+)
+# Export records from older pipelines use snake_case for some fields.
+FIELD_FALLBACKS = {"procurementType": "procurement_type"}
+_LABEL_KEYS = ("country", "countryName", "title", "name", "countryCode", "code", "url")
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    """Join small encoded pieces into ~CHUNK_SIZE byte chunks."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]], fields: Optional[Sequence[str]]) -> Iterator[bytes]:
+    return _chunked(
+        json.dumps(project(record, fields), separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+        for record in records
+    )
+
+
+def csv_value(value: Any) -> str:
+    """Flatten a field for a CSV cell: lists become "a; b", objects their label or JSON."""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "; ".join(filter(None, (csv_value(item) for item in value)))
+    if isinstance(value, dict):
+        for key in _LABEL_KEYS:
+            if value.get(key):
+                return str(value[key])
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def iter_csv(records: Iterable[Dict[str, Any]], fields: Optional[Sequence[str]]) -> Iterator[bytes]:
+    columns = list(fields) if fields else list(CSV_DEFAULT_FIELDS)
+    if "id" not in columns:
+        columns.insert(0, "id")
+
+    def rows() -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow(
+                [
+                    csv_value(record.get(column, record.get(FIELD_FALLBACKS.get(column, ""))))
+                    for column in columns
+                ]
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    return _chunked(rows())
@@ -0,0 +1,399 @@
+"""
+Precomputed in-memory indexes over the notices snapshot.
+
+Every sortable field gets a ``RankSpace``: the notices in that sort order, with
+filter bitsets (Python ints, bit ``r`` = the notice at rank ``r``) built once per
+snapshot. A request ANDs a few ints together and reads ``limit`` set bits, so
+filtering, counting and paging never scan the notice list.
+
+The indexes are built from ``NoticeColumns`` rather than the records themselves,
+so a packed snapshot can supply the columns without decoding any record.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+# Heavy fields left out of paged responses unless asked for with ``fields=``.
+LIST_EXCLUDED_FIELDS = ("searchEmbedding", "searchText", "raw_json")
+
+
+def _lower(value: Any) -> Optional[str]:
+    if value in (None, ""):
+        return None
+    return str(value).strip().lower()
+
+
+def _country_terms(record: Dict[str, Any]) -> Set[str]:
+    values = {record.get("countryCode"), record.get("country")}
+    for item in record.get("countries") or []:
+        if isinstance(item, dict):
+            values.update((item.get("countryCode"), item.get("country"), item.get("countryName")))
+    return {term for term in map(_lower, values) if term}
+
+
+def _procurement_type(record: Dict[str, Any]) -> Any:
+    return record.get("procurementType") or record.get("procurement_type")
+
+
+TERM_FIELDS: Dict[str, Callable[[Dict[str, Any]], Set[str]]] = {
+    "agency": lambda record: {term for term in [_lower(record.get("agency"))] if term},
+    "country": _country_terms,
+    "region": lambda record: {term for term in [_lower(record.get("region"))] if term},
+    "sector": lambda record: {term for term in [_lower(record.get("sector"))] if term},
+    "procurementType": lambda record: {term for term in [_lower(_procurement_type(record))] if term},
+}
+
+
+def _country_labels(record: Dict[str, Any]) -> List[Any]:
+    # One label per country (name, else code) so a notice is not counted twice.
+    labels = [
+        item.get("country") or item.get("countryName") or item.get("countryCode")
+        for item in record.get("countries") or []
+        if isinstance(item, dict)
+    ]
+    return labels or [record.get("country") or record.get("countryCode")]
+
+
+# Facets are counted on display values; each facet is narrowed by the filter of the same name.
+FACET_FIELDS: Dict[str, Callable[[Dict[str, Any]], List[Any]]] = {
+    "agency": lambda record: [record.get("agency")],
+    "country": _country_labels,
+    "region": lambda record: [record.get("region")],
+    "sector": lambda record: [record.get("sector")],
+    "procurementType": lambda record: [_procurement_type(record)],
+}
+# (label, lowest score, first score of the next band up).
+SCORE_BANDS: Tuple[Tuple[str, Optional[float], Optional[float]], ...] = (
+    ("80-100", 80, None),
+    ("60-79", 60, 80),
+    ("40-59", 40, 60),
+    ("0-39", None, 40),
+)
+
+
+def record_score(record: Dict[str, Any]) -> float:
+    try:
+        return float(record.get("totalScore") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def record_deadline(record: Dict[str, Any]) -> Optional[str]:
+    """ISO date (YYYY-MM-DD) of the deadline, which sorts and compares as a string."""
+    value = record.get("deadline")
+    return str(value)[:10] if value else None
+
+
+# Each sort key is (natural order, key of (score, deadline, id)); keys end with the id so they are unique.
+SORT_KEYS: Dict[str, Tuple[str, Callable[[float, Optional[str], str], Tuple]]] = {
+    "totalScore": ("desc", lambda score, deadline, notice_id: (-score, notice_id)),
+    "deadline": ("asc", lambda score, deadline, notice_id: (deadline is None, deadline or "", notice_id)),
+}
+
+
+@dataclass
+class NoticeColumns:
+    """The per-notice values the indexes are built from, in snapshot order."""
+
+    ids: List[str]
+    scores: List[float]
+    deadlines: List[Optional[str]]
+    # Lower-cased filter terms and display facet labels per notice, by field name.
+    terms: Dict[str, List[Tuple[str, ...]]]
+    facets: Dict[str, List[Tuple[str, ...]]]
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> "NoticeColumns":
+        return cls(
+            ids=[str(record.get("id")) for record in records],
+            scores=[record_score(record) for record in records],
+            deadlines=[record_deadline(record) for record in records],
+            terms={
+                name: [tuple(sorted(extract(record))) for record in records] for name, extract in TERM_FIELDS.items()
+            },
+            facets={
+                name: [tuple(str(value).strip() for value in extract(record) if _lower(value)) for record in records]
+                for name, extract in FACET_FIELDS.items()
+            },
+        )
+
+
+def bitset(ranks: Iterable[int], size: int) -> int:
+    """Int with bit ``r`` set for every rank, built in one pass rather than by repeated OR."""
+    buffer = bytearray((size + 7) // 8)
+    for rank in ranks:
+        buffer[rank >> 3] |= 1 << (rank & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class RangeMasks:
+    """Cumulative bitsets over the distinct values of one field, for O(log n) range masks."""
+
+    def __init__(self, values: Sequence[Any]) -> None:
+        by_value: Dict[Any, List[int]] = {}
+        for rank, value in enumerate(values):
+            if value is not None:
+                by_value.setdefault(value, []).append(rank)
+        self.values = sorted(by_value)
+        self.cumulative = [0]
+        for value in self.values:
+            self.cumulative.append(self.cumulative[-1] | bitset(by_value[value], len(values)))
+
+    def between(self, low: Any = None, high: Any = None) -> int:
+        start = bisect_left(self.values, low) if low is not None else 0
+        end = bisect_right(self.values, high) if high is not None else len(self.values)
+        if end <= start:
+            return 0
+        return self.cumulative[end] & ~self.cumulative[start]
+
+
+class RankSpace:
+    """Notices in one sort order, with filter bitsets over their ranks."""
+
+    def __init__(self, columns: NoticeColumns, key: Callable[[float, Optional[str], str], Tuple], natural: str) -> None:
+        self.natural = natural
+        keys = [key(*values) for values in zip(columns.scores, columns.deadlines, columns.ids)]
+        self.order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[position] for position in self.order]
+        self.all = (1 << len(self.order)) - 1
+        ranks_by_term: Dict[str, Dict[str, List[int]]] = {name: {} for name in TERM_FIELDS}
+        for name, values in columns.terms.items():
+            by_term = ranks_by_term[name]
+            for rank, position in enumerate(self.order):
+                for term in values[position]:
+                    by_term.setdefault(term, []).append(rank)
+        self.terms: Dict[str, Dict[str, int]] = {
+            name: {term: bitset(ranks, len(self.order)) for term, ranks in by_term.items()}
+            for name, by_term in ranks_by_term.items()
+        }
+        self.scores = RangeMasks([columns.scores[position] for position in self.order])
+        self.deadlines = RangeMasks([columns.deadlines[position] for position in self.order])
+
+    def mask(self, query: "OpportunityQuery", skip: Optional[str] = None) -> int:
+        """Ranks matching every filter in ``query`` except the one named ``skip``."""
+        mask = self.all
+        for name, wanted in query.terms.items():
+            if name == skip:
+                continue
+            masks = self.terms[name]
+            union = 0
+            for term in wanted:
+                union |= masks.get(term, 0)
+            mask &= union
+        if query.min_score is not None and skip != "scoreBand":
+            mask &= self.scores.between(low=query.min_score)
+        if query.deadline_from is not None or query.deadline_to is not None:
+            mask &= self.deadlines.between(
+                low=query.deadline_from.isoformat() if query.deadline_from else None,
+                high=query.deadline_to.isoformat() if query.deadline_to else None,
+            )
+        return mask
+
+    def page(self, mask: int, reverse: bool, after: Optional[Tuple], limit: int) -> Tuple[List[int], bool]:
+        """Ranks of the next ``limit`` matches after the cursor key, and whether more remain."""
+        if after is not None:
+            if reverse:
+                mask &= (1 << bisect_left(self.keys, after)) - 1
+            else:
+                mask &= ~((1 << bisect_right(self.keys, after)) - 1)
+        ranks: List[int] = []
+        while mask and len(ranks) < limit:
+            if reverse:
+                rank = mask.bit_length() - 1
+                mask ^= 1 << rank
+            else:
+                lowest = mask & -mask
+                rank = lowest.bit_length() - 1
+                mask ^= lowest
+            ranks.append(rank)
+        return ranks, mask != 0
+
+    @staticmethod
+    def iter_ranks(mask: int, reverse: bool) -> Iterator[int]:
+        """Every set bit of ``mask`` in rank order, without materialising a list."""
+        bits = format(mask, "b")  # most significant (highest rank) first
+        top = len(bits) - 1
+        if reverse:
+            index = bits.find("1")
+            while index != -1:
+                yield top - index
+                index = bits.find("1", index + 1)
+        else:
+            index = bits.rfind("1")
+            while index != -1:
+                yield top - index
+                index = bits.rfind("1", 0, index)
+
+
+@dataclass
+class OpportunityQuery:
+    sort: str = "totalScore"
+    order: Optional[str] = None
+    limit: int = DEFAULT_PAGE_LIMIT
+    cursor: Optional[str] = None
+    terms: Dict[str, Set[str]] = field(default_factory=dict)
+    min_score: Optional[float] = None
+    deadline_from: Optional[date] = None
+    deadline_to: Optional[date] = None
+    fields: Optional[Tuple[str, ...]] = None
+
+    def __post_init__(self) -> None:
+        if self.sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        self.order = self.order or SORT_KEYS[self.sort][0]
+        if self.order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        if not 1 <= self.limit <= MAX_PAGE_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+
+    @staticmethod
+    def split(value: Optional[str]) -> Set[str]:
+        return {term for term in (_lower(part) for part in (value or "").split(",")) if term}
+
+    @classmethod
+    def build(cls, fields: Optional[str] = None, **kwargs: Any) -> "OpportunityQuery":
+        """Build from request parameters; comma-separated filter values are OR-ed."""
+        terms = {name: cls.split(kwargs.pop(name, None)) for name in TERM_FIELDS}
+        projected = tuple(dict.fromkeys(part.strip() for part in fields.split(",") if part.strip())) if fields else None
+        return cls(terms={name: wanted for name, wanted in terms.items() if wanted}, fields=projected, **kwargs)
+
+    def cache_key(self) -> Tuple:
+        return (
+            self.sort,
+            self.order,
+            self.limit,
+            self.cursor,
+            tuple(sorted((name, tuple(sorted(wanted))) for name, wanted in self.terms.items())),
+            self.min_score,
+            self.deadline_from,
+            self.deadline_to,
+            self.fields,
+        )
+
+
+def encode_cursor(sort: str, order: str, key: Tuple) -> str:
+    payload = json.dumps([sort, order, list(key)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> Tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, key = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor was issued for a different sort order")
+    return tuple(key)
+
+
+def wants_embedding(fields: Optional[Iterable[str]]) -> bool:
+    """Whether a projection needs ``searchEmbedding`` (excluded by default)."""
+    return fields is not None and "searchEmbedding" in fields
+
+
+def project(record: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return {name: value for name, value in record.items() if name not in LIST_EXCLUDED_FIELDS}
+    projected = {"id": record.get("id")}
+    projected.update((name, record[name]) for name in fields if name in record)
+    return projected
+
+
+class NoticeIndex:
+    """
+    Rank spaces for every sort key over one snapshot of notices, plus facet bitsets.
+
+    ``summaries`` are the records without ``searchEmbedding`` (the same sequence
+    unless the snapshot stores them separately); they are returned whenever the
+    projection does not ask for the embedding.
+    """
+
+    def __init__(
+        self,
+        records: Sequence[Dict[str, Any]],
+        columns: Optional[NoticeColumns] = None,
+        summaries: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        self.records = records
+        self.summaries = summaries if summaries is not None else records
+        columns = columns if columns is not None else NoticeColumns.from_records(records)
+        self.positions: Dict[str, int] = {notice_id: position for position, notice_id in enumerate(columns.ids)}
+        self.spaces = {name: RankSpace(columns, key, natural) for name, (natural, key) in SORT_KEYS.items()}
+        self.facet_masks = self._build_facets(self.spaces["totalScore"], columns)
+        self.default_facets = self.facets(OpportunityQuery())
+
+    def __contains__(self, notice_id: str) -> bool:
+        return notice_id in self.positions
+
+    def get(self, notice_id: str, with_embedding: bool = True) -> Optional[Dict[str, Any]]:
+        position = self.positions.get(notice_id)
+        if position is None:
+            return None
+        return (self.records if with_embedding else self.summaries)[position]
+
+    def iter_matches(self, query: OpportunityQuery) -> Iterator[Dict[str, Any]]:
+        """Every notice matching ``query`` in its sort order (no paging), unprojected."""
+        space = self.spaces[query.sort]
+        records = self.records if wants_embedding(query.fields) else self.summaries
+        for rank in space.iter_ranks(space.mask(query), reverse=query.order != space.natural):
+            yield records[space.order[rank]]
+
+    @staticmethod
+    def _build_facets(space: RankSpace, columns: NoticeColumns) -> Dict[str, Dict[str, int]]:
+        facets: Dict[str, Dict[str, int]] = {}
+        for name, values in columns.facets.items():
+            labels: Dict[str, str] = {}
+            ranks: Dict[str, List[int]] = {}
+            for rank, position in enumerate(space.order):
+                for label in values[position]:
+                    term = _lower(label)
+                    labels.setdefault(term, label)
+                    ranks.setdefault(term, []).append(rank)
+            facets[name] = {labels[term]: bitset(term_ranks, len(space.order)) for term, term_ranks in ranks.items()}
+        facets["scoreBand"] = {
+            label: space.scores.between(low=low) & ~(space.scores.between(low=high) if high is not None else 0)
+            for label, low, high in SCORE_BANDS
+        }
+        return facets
+
+    def facets(self, query: OpportunityQuery) -> Dict[str, Any]:
+        """
+        Counts per facet value among notices matching ``query``. A facet ignores its
+        own filter, so the other values of a filtered facet keep their counts.
+        """
+        space = self.spaces["totalScore"]
+        matching = space.mask(query)
+        facets: Dict[str, List[Dict[str, Any]]] = {}
+        for name, masks in self.facet_masks.items():
+            narrowed = name in query.terms or (name == "scoreBand" and query.min_score is not None)
+            base = space.mask(query, skip=name) if narrowed else matching
+            counts = [(label, (base & mask).bit_count()) for label, mask in masks.items()]
+            if name != "scoreBand":
+                counts.sort(key=lambda item: (-item[1], item[0].lower()))
+            facets[name] = [{"value": label, "count": count} for label, count in counts if count]
+        return {"total": matching.bit_count(), "facets": facets}
+
+    def query(self, query: OpportunityQuery) -> Dict[str, Any]:
+        space = self.spaces[query.sort]
+        reverse = query.order != space.natural
+        after = decode_cursor(query.cursor, query.sort, query.order) if query.cursor else None
+        mask = space.mask(query)
+        ranks, has_more = space.page(mask, reverse, after, query.limit)
+        next_cursor = encode_cursor(query.sort, query.order, space.keys[ranks[-1]]) if has_more else None
+        records = self.records if wants_embedding(query.fields) else self.summaries
+        return {
+            "notices": [project(records[space.order[rank]], query.fields) for rank in ranks],
+            "total": mask.bit_count(),
+            "sort": query.sort,
+            "order": query.order,
+            "nextCursor": next_cursor,
+        }
@@ -0,0 +1,359 @@
+"""
+Immutable binary notice snapshot, shared by API workers through a read-only memory map.
+
+The pipeline writes the notices once as a packed file; every uvicorn worker maps
+the same file, so the records, the full feed (plain and gzip) and the embedding
+matrix live in the shared page cache rather than in each worker's heap. A worker
+only builds its bitset indexes, from the small columnar arrays.
+
+Layout: ``MAGIC``, a little-endian uint64 header length, a JSON header, then
+64-byte aligned sections described by the header (offset relative to the data
+area, dtype, shape):
+
+- ``strings`` / ``strings.offsets``: string table (ids, deadlines, terms, labels)
+- ``ids``, ``scores``, ``deadlines``: one value per notice (string ids, -1 = none)
+- ``terms.<field>`` / ``facets.<field>`` (+ ``.offsets``): string ids per notice
+- ``feed`` / ``feed.gzip``: the ``{"notices": [...]}`` body as served by /opportunities
+- ``records``: per notice, the start, embedding start and end of its JSON in ``feed``
+  (``searchEmbedding`` is written last so the record without it is a prefix)
+- ``embeddings`` / ``embeddings.rows``: unit-normalised float32 matrix and notice positions
+
+Publishing writes a temporary file and renames it over the old one, so readers
+see either version whole; workers keep serving the old map until they reopen.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Sequence as SequenceABC
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..repository import NoticeRepository
+from .index import NoticeColumns, NoticeIndex
+from .snapshot import GZIP_LEVEL, EncodedBody, NoticeSnapshot, body_etag, encode_json, notice_record, record_load
+from .vectors import EmbeddingMatrix
+
+LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"NOTICES\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+DEFAULT_PACKED_PATH = "output/notices.snapshot"
+_HEADER_LENGTH = struct.Struct("<Q")
+_EMBEDDING_KEY = b',"searchEmbedding":'
+
+
+class PackedFormatError(ValueError):
+    """Raised when a packed snapshot is truncated, foreign or of another format version."""
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        return self.ids.setdefault(value, len(self.ids))
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [value.encode("utf-8") for value in self.ids]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _ragged(rows: Iterable[Iterable[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(offsets, values) of a list of int lists, CSR style."""
+    rows = [list(row) for row in rows]
+    offsets = np.zeros(len(rows) + 1, dtype=np.uint32)
+    np.cumsum([len(row) for row in rows], out=offsets[1:])
+    return offsets, np.asarray([value for row in rows for value in row], dtype=np.uint32)
+
+
+def _feed(records: Sequence[Dict[str, Any]]) -> Tuple[bytes, np.ndarray]:
+    """The feed body and each record's (start, embedding start, end) within it."""
+    pieces = [b'{"notices":[']
+    spans = np.zeros((len(records), 3), dtype=np.uint64)
+    offset = len(pieces[0])
+    for position, record in enumerate(records):
+        if position:
+            pieces.append(b",")
+            offset += 1
+        embedding = record.get("searchEmbedding")
+        body = encode_json({key: value for key, value in record.items() if key != "searchEmbedding"})
+        summary_end = offset + len(body) - 1
+        if embedding is not None:
+            separator = _EMBEDDING_KEY if body != b"{}" else _EMBEDDING_KEY[1:]
+            body = body[:-1] + separator + encode_json(embedding) + b"}"
+        spans[position] = (offset, summary_end, offset + len(body))
+        pieces.append(body)
+        offset += len(body)
+    pieces.append(b"]}")
+    return b"".join(pieces), spans
+
+
+def write_packed_snapshot(
+    records: Sequence[Dict[str, Any]],
+    path: str = DEFAULT_PACKED_PATH,
+    run_id: Optional[int] = None,
+) -> Path:
+    """Pack export-shaped ``records`` (in feed order) and atomically replace ``path``."""
+    started = time.perf_counter()
+    columns = NoticeColumns.from_records(records)
+    strings = _StringTable()
+    sections: Dict[str, np.ndarray] = {}
+    sections["ids"] = np.asarray([strings.add(value) for value in columns.ids], dtype=np.uint32)
+    sections["scores"] = np.asarray(columns.scores, dtype=np.float64)
+    sections["deadlines"] = np.asarray(
+        [strings.add(value) if value is not None else -1 for value in columns.deadlines], dtype=np.int64
+    )
+    for group, values in (("terms", columns.terms), ("facets", columns.facets)):
+        for name, rows in values.items():
+            offsets, ids = _ragged([strings.add(value) for value in row] for row in rows)
+            sections[f"{group}.{name}.offsets"], sections[f"{group}.{name}"] = offsets, ids
+    sections["strings.offsets"], sections["strings"] = strings.arrays()
+
+    feed, spans = _feed(records)
+    feed_gzip = gzip.compress(feed, GZIP_LEVEL, mtime=0)
+    sections["feed"] = np.frombuffer(feed, dtype=np.uint8)
+    sections["feed.gzip"] = np.frombuffer(feed_gzip, dtype=np.uint8)
+    sections["records"] = spans
+    embeddings = EmbeddingMatrix.from_records(records)
+    positions = {notice_id: position for position, notice_id in enumerate(columns.ids)}
+    sections["embeddings"] = embeddings.matrix
+    sections["embeddings.rows"] = np.asarray([positions[notice_id] for notice_id in embeddings.ids], dtype=np.uint32)
+
+    layout: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, array in sections.items():
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+    header = encode_json(
+        {
+            "version": FORMAT_VERSION,
+            "count": len(records),
+            "run_id": run_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "feed_etag": body_etag(feed),
+            "sections": layout,
+        }
+    )
+    data_start = _align(len(MAGIC) + _HEADER_LENGTH.size + len(header))
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp")
+    with open(tmp, "wb") as handle:
+        handle.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+        for name, array in sections.items():
+            handle.seek(data_start + layout[name]["offset"])
+            handle.write(np.ascontiguousarray(array).tobytes())
+        handle.truncate(data_start + offset)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp, target)
+    LOGGER.info(
+        "Packed %d notices into %s (%.1f MB) in %.2fs",
+        len(records),
+        target,
+        (data_start + offset) / 1e6,
+        time.perf_counter() - started,
+    )
+    return target
+
+
+def publish_packed_snapshot(
+    repository: NoticeRepository,
+    path: str = DEFAULT_PACKED_PATH,
+    run_id: Optional[int] = None,
+) -> Path:
+    """Pack every stored notice, in the order the database snapshot serves them."""
+    records = [
+        notice_record(notice) for notice in repository.iter_notices(include_raw_json=True, include_embedding=True)
+    ]
+    return write_packed_snapshot(records, path, run_id=run_id)
+
+
+class RecordTable(SequenceABC):
+    """Records decoded from the mapped feed on access; nothing is held per record."""
+
+    def __init__(self, feed: memoryview, spans: np.ndarray, with_embedding: bool = True) -> None:
+        self.feed = feed
+        self.spans = spans
+        self.with_embedding = with_embedding
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        start, summary_end, end = (int(value) for value in self.spans[position])
+        if self.with_embedding or summary_end == end - 1:
+            return json.loads(bytes(self.feed[start:end]))
+        return json.loads(bytes(self.feed[start:summary_end]) + b"}")
+
+    def summaries(self) -> "RecordTable":
+        """The same records without ``searchEmbedding``, which is then never parsed."""
+        return RecordTable(self.feed, self.spans, with_embedding=False)
+
+
+class PackedSnapshotFile:
+    """A read-only memory map of one packed snapshot file."""
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        prefix = len(MAGIC) + _HEADER_LENGTH.size
+        if self._map[: len(MAGIC)] != MAGIC or len(self._map) < prefix:
+            raise PackedFormatError(f"{path} is not a packed notices snapshot")
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._map, len(MAGIC))
+        try:
+            self.header = json.loads(self._map[prefix : prefix + header_length])
+        except ValueError as exc:
+            raise PackedFormatError(f"{path} has a corrupt header") from exc
+        if self.header.get("version") != FORMAT_VERSION:
+            raise PackedFormatError(f"{path} has format version {self.header.get('version')}, expected {FORMAT_VERSION}")
+        self._data_start = _align(prefix + header_length)
+
+    def array(self, name: str) -> np.ndarray:
+        section = self.header["sections"][name]
+        dtype = np.dtype(section["dtype"])
+        count = int(np.prod(section["shape"]))
+        start = self._data_start + section["offset"]
+        if start + count * dtype.itemsize > len(self._map):
+            raise PackedFormatError(f"Section {name} runs past the end of the file")
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=start).reshape(section["shape"])
+
+    def view(self, name: str) -> memoryview:
+        array = self.array(name)
+        start = self._data_start + self.header["sections"][name]["offset"]
+        return memoryview(self._map)[start : start + array.nbytes]
+
+    def strings(self) -> List[str]:
+        offsets = self.array("strings.offsets").tolist()
+        data = self.view("strings")
+        return [bytes(data[start:end]).decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+    def _ragged(self, name: str, strings: List[str]) -> List[Tuple[str, ...]]:
+        offsets = self.array(f"{name}.offsets").tolist()
+        values = [strings[value] for value in self.array(name).tolist()]
+        return [tuple(values[start:end]) for start, end in zip(offsets, offsets[1:])]
+
+    def columns(self) -> NoticeColumns:
+        strings = self.strings()
+        groups: Dict[str, Dict[str, List[Tuple[str, ...]]]] = {"terms": {}, "facets": {}}
+        for name in self.header["sections"]:
+            group, _, field = name.partition(".")
+            if group in groups and not field.endswith(".offsets"):
+                groups[group][field] = self._ragged(name, strings)
+        return NoticeColumns(
+            ids=[strings[value] for value in self.array("ids").tolist()],
+            scores=self.array("scores").tolist(),
+            deadlines=[strings[value] if value >= 0 else None for value in self.array("deadlines").tolist()],
+            terms=groups["terms"],
+            facets=groups["facets"],
+        )
+
+    def snapshot(self, mtime: Optional[float] = None) -> NoticeSnapshot:
+        columns = self.columns()
+        records = RecordTable(self.view("feed"), self.array("records"))
+        summaries = records.summaries()
+        rows = self.array("embeddings.rows").tolist()
+        return NoticeSnapshot(
+            records,
+            mtime=mtime,
+            index=NoticeIndex(records, columns=columns, summaries=summaries),
+            embeddings=EmbeddingMatrix([columns.ids[row] for row in rows], self.array("embeddings")),
+            feed=EncodedBody(self.view("feed"), etag=self.header["feed_etag"], gzipped=self.view("feed.gzip")),
+        )
+
+
+class PackedSnapshotCache:
+    """
+    Serves the packed snapshot at ``path`` when it exists, else ``fallback``.
+
+    Like ``NoticeSnapshotCache`` each ``get()`` costs one ``stat``; a new file
+    (the pipeline renames a fresh one into place) is mapped and swapped in with a
+    single reference assignment. Requests still holding the previous snapshot keep
+    its map until they finish. An unreadable file keeps the previous snapshot.
+    """
+
+    def __init__(self, path: Path, fallback) -> None:
+        self.path = Path(path)
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._snapshot: Optional[NoticeSnapshot] = None
+
+    def _stat_key(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def needs_check(self) -> bool:
+        """True when ``get()`` will map a new file or may consult the fallback."""
+        key = self._stat_key()
+        if key is not None and key != self._key:
+            return True
+        return self._snapshot is None and self.fallback.needs_check()
+
+    def get(self) -> NoticeSnapshot:
+        key = self._stat_key()
+        if key is None:
+            return self.fallback.get()
+        if key != self._key:
+            with self._lock:
+                if key != self._key:
+                    self._load(key)
+                    self._key = key
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None else self.fallback.get()
+
+    def _load(self, key: Tuple[int, int, int]) -> None:
+        started = time.perf_counter()
+        try:
+            snapshot = PackedSnapshotFile(self.path).snapshot(mtime=key[1] / 1e9)
+        except (OSError, ValueError, KeyError) as exc:
+            kept = "the previous snapshot" if self._snapshot is not None else "the fallback"
+            LOGGER.warning("Could not map packed snapshot %s, serving %s: %s", self.path, kept, exc)
+            return
+        self._snapshot = snapshot
+        elapsed = time.perf_counter() - started
+        record_load("packed", len(snapshot.notices), elapsed)
+        LOGGER.info("Mapped %d notices from %s in %.3fs", len(snapshot.notices), self.path, elapsed)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Publish the packed notices snapshot served by the API")
+    parser.add_argument("--db", default=None, help="Override database URL")
+    parser.add_argument("--output", default=os.getenv("NOTICES_SNAPSHOT_PATH", DEFAULT_PACKED_PATH))
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args()
+    repository = NoticeRepository(args.db or os.getenv("DATABASE_URL", "sqlite:///data/notices.db"))
+    latest = repository.latest_run()
+    publish_packed_snapshot(repository, args.output, run_id=latest.id if latest else None)
+
+
+if __name__ == "__main__":
+    main()
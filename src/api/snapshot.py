@@ -0,0 +1,239 @@
+"""In-memory snapshot of the exported notices feed, reloaded when the file changes."""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import formatdate
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple, Union
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..repository import NoticeRepository
+from .index import NoticeIndex
+from .metrics import ENCODED_CACHE, SNAPSHOT_LOAD_SECONDS, SNAPSHOT_LOADS, SNAPSHOT_NOTICES
+from .vectors import EmbeddingMatrix
+
+LOGGER = logging.getLogger(__name__)
+
+GZIP_LEVEL = 6
+ENCODED_CACHE_SIZE = 256
+RUN_CHECK_INTERVAL = 2.0
+
+
+def encode_json(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def body_etag(raw: Union[bytes, memoryview]) -> str:
+    return f'W/"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+
+class EncodedBody:
+    """A JSON response body encoded once, with its validator and (lazily) its gzip variant."""
+
+    def __init__(self, raw: Union[bytes, memoryview], etag: Optional[str] = None, gzipped: Optional[bytes] = None) -> None:
+        self.raw = raw
+        # Weak validator: the identity and gzip bodies are semantically identical.
+        self.etag = etag or body_etag(raw)
+        if gzipped is not None:
+            self.gzipped = gzipped
+
+    @classmethod
+    def from_payload(cls, payload: Any) -> "EncodedBody":
+        return cls(encode_json(payload))
+
+    @cached_property
+    def gzipped(self) -> Union[bytes, memoryview]:
+        return gzip.compress(self.raw, GZIP_LEVEL, mtime=0)
+
+
+class NoticeSnapshot:
+    """
+    One version of the notices, with their indexes and embedding matrix.
+
+    The index, embedding matrix and full-feed body are built from ``notices``
+    unless supplied (a packed snapshot provides them from its memory map).
+    """
+
+    def __init__(
+        self,
+        notices: Sequence[Dict[str, Any]],
+        mtime: Optional[float] = None,
+        index: Optional[NoticeIndex] = None,
+        embeddings: Optional[EmbeddingMatrix] = None,
+        feed: Optional[EncodedBody] = None,
+    ) -> None:
+        self.notices = notices
+        self.mtime = int(mtime) if mtime is not None else None
+        self.last_modified = formatdate(mtime, usegmt=True) if mtime is not None else None
+        self.index = index if index is not None else NoticeIndex(notices)
+        self.embeddings = embeddings if embeddings is not None else EmbeddingMatrix.from_records(notices)
+        if feed is not None:
+            self.feed = feed
+        self._encoded: "OrderedDict[Hashable, EncodedBody]" = OrderedDict()
+        self._encoded_lock = threading.Lock()
+
+    @cached_property
+    def feed(self) -> EncodedBody:
+        """The whole export as one body, encoded on first use."""
+        return EncodedBody.from_payload({"notices": self.notices})
+
+    def encoded(self, key: Hashable, build: Callable[[], Any]) -> EncodedBody:
+        """Encoded body for ``key``, built from ``build()`` on a miss (LRU, per snapshot)."""
+        with self._encoded_lock:
+            body = self._encoded.get(key)
+            if body is not None:
+                self._encoded.move_to_end(key)
+                ENCODED_CACHE.inc(result="hit")
+                return body
+        ENCODED_CACHE.inc(result="miss")
+        body = EncodedBody.from_payload(build())
+        with self._encoded_lock:
+            self._encoded[key] = body
+            if len(self._encoded) > ENCODED_CACHE_SIZE:
+                self._encoded.popitem(last=False)
+        return body
+
+
+def record_load(source: str, notices: int, seconds: float) -> None:
+    SNAPSHOT_LOADS.inc(source=source)
+    SNAPSHOT_LOAD_SECONDS.set(seconds, source=source)
+    SNAPSHOT_NOTICES.set(notices)
+
+
+class NoticeSnapshotCache:
+    """
+    Keeps the latest ``NoticeSnapshot`` of ``path``.
+
+    Each ``get()`` costs one ``stat``; the file is only re-read when its mtime or
+    size changes. If the file cannot be parsed (e.g. it is being rewritten) the
+    previous snapshot is kept.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple[int, int]] = None
+        self._snapshot: Optional[NoticeSnapshot] = None
+
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def needs_check(self) -> bool:
+        """True when the file changed since the last load, so ``get()`` will re-read it."""
+        return self._snapshot is None or self._stat_key() != self._key
+
+    def get(self) -> NoticeSnapshot:
+        key = self._stat_key()
+        snapshot = self._snapshot
+        if snapshot is not None and key == self._key:
+            return snapshot
+        with self._lock:
+            if self._snapshot is not None and key == self._key:
+                return self._snapshot
+            self._snapshot = self._load(key)
+            self._key = key
+            return self._snapshot
+
+    def _load(self, key: Optional[Tuple[int, int]]) -> NoticeSnapshot:
+        if key is None:
+            return NoticeSnapshot([])
+        started = time.perf_counter()
+        try:
+            notices = json.loads(self.path.read_bytes())
+        except (OSError, json.JSONDecodeError) as exc:
+            if self._snapshot is not None:
+                LOGGER.warning("Keeping previous notices snapshot; failed to read %s: %s", self.path, exc)
+                return self._snapshot
+            raise
+        snapshot = NoticeSnapshot(notices, mtime=key[0] / 1e9)
+        record_load("file", len(notices), time.perf_counter() - started)
+        LOGGER.info("Loaded %d notices from %s", len(notices), self.path)
+        return snapshot
+
+
+def notice_record(notice: Any) -> Dict[str, Any]:
+    """The export-shaped record for a stored notice (what ``export_json`` writes)."""
+    record = dict(notice.raw_json or {})
+    record.setdefault("id", notice.id)
+    if notice.fit_score is not None:
+        record.setdefault("totalScore", notice.fit_score)
+    if notice.search_embedding and "searchEmbedding" not in record:
+        record["searchEmbedding"] = notice.search_embedding
+    return record
+
+
+class RepositorySnapshotCache:
+    """
+    Read-through ``NoticeSnapshot`` of the notices table.
+
+    The snapshot is rebuilt when the pipeline records a new run (``pipeline_runs``);
+    the latest run id is checked at most every ``check_interval`` seconds, so most
+    requests touch no database at all. Until the database has a recorded run, or
+    while it cannot be read, the export file snapshot is served instead.
+    """
+
+    def __init__(
+        self,
+        repository: Callable[[], NoticeRepository],
+        fallback: NoticeSnapshotCache,
+        check_interval: float = RUN_CHECK_INTERVAL,
+    ) -> None:
+        self.repository = repository
+        self.fallback = fallback
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = float("-inf")
+        self._run_id: Optional[int] = None
+        self._snapshot: Optional[NoticeSnapshot] = None
+
+    def needs_check(self) -> bool:
+        """True when the next ``get()`` may query the database (callers can offload it)."""
+        return time.monotonic() - self._checked >= self.check_interval
+
+    def get(self) -> NoticeSnapshot:
+        if self.needs_check():
+            with self._lock:
+                if self.needs_check():
+                    self._refresh()
+                    self._checked = time.monotonic()
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None else self.fallback.get()
+
+    def _refresh(self) -> None:
+        try:
+            repository = self.repository()
+            run = repository.latest_run()
+            if run is None:
+                self._run_id, self._snapshot = None, None
+                return
+            if run.id == self._run_id:
+                return
+            started = time.perf_counter()
+            records = [
+                notice_record(notice)
+                for notice in repository.iter_notices(include_raw_json=True, include_embedding=True)
+            ]
+        except SQLAlchemyError as exc:
+            serving = "the cached snapshot" if self._snapshot is not None else str(self.fallback.path)
+            LOGGER.warning("Notices database unavailable, serving %s: %s", serving, exc)
+            return
+        finished = run.finished_at or run.started_at
+        mtime = finished.replace(tzinfo=timezone.utc).timestamp() if finished else None
+        self._snapshot = NoticeSnapshot(records, mtime=mtime)
+        self._run_id = run.id
+        elapsed = time.perf_counter() - started
+        record_load("database", len(records), elapsed)
+        LOGGER.info("Loaded %d notices from pipeline run %s in %.2fs", len(records), run.id, elapsed)
@@ -0,0 +1,111 @@
+"""Exact cosine kNN over the notice embeddings in the exported feed."""
+from __future__ import annotations
+
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+QUERY_CACHE_SIZE = 1024
+
+
+class EmbeddingUnavailable(RuntimeError):
+    """Raised when query text cannot be embedded (no client, or a model/dimension mismatch)."""
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingMatrix:
+    """
+    Unit-normalised ``searchEmbedding`` vectors as one contiguous float32 matrix,
+    so a query is a single matrix-vector product. Notices without an embedding
+    (or with a different dimension from the majority) are left out.
+    """
+
+    def __init__(self, ids: List[str], matrix: np.ndarray) -> None:
+        """``matrix`` rows must already be unit-normalised; it may be a read-only memory map."""
+        self.ids = ids
+        self.rows: Dict[str, int] = {notice_id: row for row, notice_id in enumerate(ids)}
+        self.matrix = matrix
+        self.dim = matrix.shape[1]
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]]) -> "EmbeddingMatrix":
+        vectors = [(str(record.get("id")), record.get("searchEmbedding")) for record in records]
+        vectors = [(notice_id, vector) for notice_id, vector in vectors if vector]
+        dims = [len(vector) for _, vector in vectors]
+        dim = max(set(dims), key=dims.count) if dims else 0
+        kept = [(notice_id, vector) for notice_id, vector in vectors if len(vector) == dim]
+        matrix = np.asarray([vector for _, vector in kept], dtype=np.float32).reshape(len(kept), dim)
+        if len(kept) < len(records):
+            LOGGER.info("Embedding matrix: %d of %d notices have a %d-d embedding", len(kept), len(records), dim)
+        return cls([notice_id for notice_id, _ in kept], np.ascontiguousarray(_normalize(matrix)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def top_k(self, vector: np.ndarray, k: int, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Ids and cosine similarities of the ``k`` nearest notices, best first."""
+        if not len(self.ids) or k <= 0:
+            return []
+        if vector.shape[-1] != self.dim:
+            raise EmbeddingUnavailable(f"Query embedding has {vector.shape[-1]} dimensions, notices have {self.dim}")
+        scores = self.matrix @ _normalize(vector.astype(np.float32, copy=False))
+        if exclude is not None and exclude in self.rows:
+            scores[self.rows[exclude]] = -np.inf
+        k = min(k, len(self.ids) - (1 if exclude in self.rows else 0))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = sorted(candidates, key=lambda row: (-scores[row], self.ids[row]))
+        return [(self.ids[row], float(scores[row])) for row in ranked]
+
+    def similar(self, notice_id: str, k: int) -> List[Tuple[str, float]]:
+        row = self.rows.get(notice_id)
+        if row is None:
+            return []
+        return self.top_k(self.matrix[row], k, exclude=notice_id)
+
+
+class QueryEmbedder:
+    """Embeds search text with the same OpenAI model as the pipeline, memoising recent queries."""
+
+    def __init__(self, model: Optional[str] = None, cache_size: int = QUERY_CACHE_SIZE) -> None:
+        self.model = model or os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+        self._client = None
+        self._embed_cached = lru_cache(maxsize=cache_size)(self._embed)
+
+    def _openai(self):
+        if self._client is None:
+            try:
+                from openai import OpenAI
+
+                self._client = OpenAI()
+            except Exception as exc:  # pylint: disable=broad-except
+                raise EmbeddingUnavailable(f"OpenAI client unavailable: {exc}") from exc
+        return self._client
+
+    def _embed(self, text: str) -> np.ndarray:
+        try:
+            response = self._openai().embeddings.create(model=self.model, input=[text])
+        except EmbeddingUnavailable:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            raise EmbeddingUnavailable(f"Embedding request failed: {exc}") from exc
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        return vector
+
+    def cache_info(self):
+        return self._embed_cached.cache_info()
+
+    def __call__(self, text: str) -> np.ndarray:
+        return self._embed_cached(" ".join(text.split()))
@@ -0,0 +1,296 @@
+"""Move expired or closed notices out of the hot tables into archive tables."""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Column, DateTime, Index, MetaData, Table, bindparam, delete, func, insert, or_, select
+from sqlalchemy.engine import Connection
+
+from .api.packed import DEFAULT_PACKED_PATH, publish_packed_snapshot
+from .config_loader import load_scoring_config
+from .models import Notice, NoticeCountry, NoticeDocument, NoticeUNSPSC
+from .repository import NoticeRepository, create_notice_engine, delete_search_rows
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_BATCH_SIZE = 500
+DEFAULT_CLOSED_STATUSES = ("Closed", "Cancelled", "Awarded")
+
+_archive_metadata = MetaData()
+
+
+def _archive_table(source: Table, *extra, indexed: Sequence[str] = ()) -> Table:
+    """Same columns as ``source``; no foreign keys back to the hot tables."""
+    name = f"archived_{source.name}"
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, autoincrement=column.autoincrement)
+        for column in source.columns
+    ]
+    indexes = [Index(f"ix_{name}_{column}", column) for column in indexed]
+    return Table(name, _archive_metadata, *columns, *extra, *indexes)
+
+
+archived_notices = _archive_table(
+    Notice.__table__,
+    Column("archived_at", DateTime),
+    indexed=("deadline", "agency"),
+)
+ARCHIVED_CHILDREN = tuple(
+    (table, _archive_table(table, indexed=("notice_id",)))
+    for table in (NoticeDocument.__table__, NoticeUNSPSC.__table__, NoticeCountry.__table__)
+)
+
+
+@dataclass
+class ArchiveStats:
+    notices: int = 0
+    child_rows: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+def expired_clause(cutoff: date, closed_statuses: Sequence[str]):
+    notices = Notice.__table__
+    clauses = [notices.c.deadline < cutoff]
+    if closed_statuses:
+        clauses.append(func.lower(notices.c.status).in_([status.lower() for status in closed_statuses]))
+    return or_(*clauses)
+
+
+class NoticeArchiver:
+    """
+    Moves notices past their deadline (plus ``grace_days``) or in a closed status,
+    with their child rows, from the hot tables into ``archived_*`` tables.
+
+    The archive lives in the same database by default, so each batch is copied
+    with ``INSERT ... SELECT`` and deleted in one transaction. With a separate
+    ``archive_url`` a batch is written to the archive database first and only
+    then removed from the hot one; archiving replaces any archived copy of the
+    same notices, so a batch interrupted between the two steps is simply
+    archived again on the next run.
+    """
+
+    def __init__(
+        self,
+        repository: NoticeRepository,
+        archive_url: Optional[str] = None,
+        grace_days: int = 0,
+        closed_statuses: Sequence[str] = DEFAULT_CLOSED_STATUSES,
+        batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE,
+    ) -> None:
+        self.repository = repository
+        self.same_database = archive_url is None
+        self.archive_engine = repository.engine if self.same_database else create_notice_engine(archive_url)
+        self.grace_days = grace_days
+        self.closed_statuses = tuple(closed_statuses)
+        self.batch_size = batch_size
+        _archive_metadata.create_all(self.archive_engine)
+
+    def cutoff(self, today: Optional[date] = None) -> date:
+        return (today or date.today()) - timedelta(days=self.grace_days)
+
+    def is_archivable(self, notice: Notice, today: Optional[date] = None) -> bool:
+        """Whether ``run`` would archive ``notice``; mirrors ``expired_clause``."""
+        if notice.deadline is not None and notice.deadline < self.cutoff(today):
+            return True
+        closed = {status.lower() for status in self.closed_statuses}
+        return bool(notice.status) and notice.status.lower() in closed
+
+    def _expired_ids(self, connection: Connection, cutoff: date, after: str) -> List[str]:
+        notices = Notice.__table__
+        return list(
+            connection.execute(
+                select(notices.c.id)
+                .where(expired_clause(cutoff, self.closed_statuses), notices.c.id > after)
+                .order_by(notices.c.id)
+                .limit(self.batch_size)
+            ).scalars()
+        )
+
+    def run(self, today: Optional[date] = None, dry_run: bool = False) -> ArchiveStats:
+        stats = ArchiveStats()
+        started = time.perf_counter()
+        cutoff = self.cutoff(today)
+        after = ""
+        while True:
+            with self.repository.engine.connect() as connection:
+                ids = self._expired_ids(connection, cutoff, after)
+            if not ids:
+                break
+            after = ids[-1]
+            stats.batches += 1
+            stats.notices += len(ids)
+            if dry_run:
+                continue
+            if self.same_database:
+                with self.repository.engine.begin() as connection:
+                    stats.child_rows += self._copy_local(connection, ids)
+                    self._delete_hot(connection, ids)
+            else:
+                stats.child_rows += self._copy_remote(ids)
+                with self.repository.engine.begin() as connection:
+                    self._delete_hot(connection, ids)
+        stats.seconds = time.perf_counter() - started
+        LOGGER.info(
+            "%s %s notices (%s child rows) with deadline before %s or closed status in %s batches (%.2fs)",
+            "Would archive" if dry_run else "Archived",
+            stats.notices,
+            stats.child_rows,
+            cutoff,
+            stats.batches,
+            stats.seconds,
+        )
+        return stats
+
+    def _copy_local(self, connection: Connection, ids: List[str]) -> int:
+        notices = Notice.__table__
+        now = datetime.utcnow()
+        self._clear_archive(connection, ids)
+        columns = [column.name for column in notices.columns]
+        connection.execute(
+            insert(archived_notices).from_select(
+                columns + ["archived_at"],
+                select(*notices.c, bindparam("archived_at", now, type_=archived_notices.c.archived_at.type)).where(
+                    notices.c.id.in_(ids)
+                ),
+            )
+        )
+        copied = 0
+        for hot, archived in ARCHIVED_CHILDREN:
+            names = [column.name for column in hot.columns if column.name != "id"]
+            result = connection.execute(
+                insert(archived).from_select(names, select(*(hot.c[name] for name in names)).where(hot.c.notice_id.in_(ids)))
+            )
+            copied += max(result.rowcount or 0, 0)
+        return copied
+
+    def _copy_remote(self, ids: List[str]) -> int:
+        notices = Notice.__table__
+        now = datetime.utcnow()
+        with self.repository.engine.connect() as source:
+            rows = [dict(row._mapping) for row in source.execute(select(notices).where(notices.c.id.in_(ids)))]
+            children = {
+                archived.name: [
+                    {key: value for key, value in row._mapping.items() if key != "id"}
+                    for row in source.execute(select(hot).where(hot.c.notice_id.in_(ids)))
+                ]
+                for hot, archived in ARCHIVED_CHILDREN
+            }
+        for row in rows:
+            row["archived_at"] = now
+
+        copied = 0
+        with self.archive_engine.begin() as target:
+            self._clear_archive(target, ids)
+            if rows:
+                target.execute(insert(archived_notices), rows)
+            for _, archived in ARCHIVED_CHILDREN:
+                values = children[archived.name]
+                if values:
+                    target.execute(insert(archived), values)
+                    copied += len(values)
+        return copied
+
+    @staticmethod
+    def _clear_archive(connection: Connection, ids: List[str]) -> None:
+        # A notice can be archived again after it reappeared in the hot table.
+        for _, archived in ARCHIVED_CHILDREN:
+            connection.execute(delete(archived).where(archived.c.notice_id.in_(ids)))
+        connection.execute(delete(archived_notices).where(archived_notices.c.id.in_(ids)))
+
+    def _delete_hot(self, connection: Connection, ids: List[str]) -> None:
+        for hot, _ in ARCHIVED_CHILDREN:
+            connection.execute(delete(hot).where(hot.c.notice_id.in_(ids)))
+        if self.repository.dialect == "sqlite":
+            delete_search_rows(connection, ids)
+        connection.execute(delete(Notice.__table__).where(Notice.__table__.c.id.in_(ids)))
+
+    def iter_archived(
+        self,
+        agency: Optional[str] = None,
+        deadline_from: Optional[date] = None,
+        deadline_to: Optional[date] = None,
+        batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE,
+    ) -> Iterator[Dict]:
+        """Stream archived notices (without the heavy payload columns) newest deadline first."""
+        columns = [column for column in archived_notices.c if column.name not in ("raw_json", "search_embedding")]
+        stmt = select(*columns).order_by(archived_notices.c.deadline.desc(), archived_notices.c.id)
+        if agency is not None:
+            stmt = stmt.where(archived_notices.c.agency == agency)
+        if deadline_from is not None:
+            stmt = stmt.where(archived_notices.c.deadline >= deadline_from)
+        if deadline_to is not None:
+            stmt = stmt.where(archived_notices.c.deadline <= deadline_to)
+        with self.archive_engine.connect() as connection:
+            for row in connection.execution_options(yield_per=batch_size).execute(stmt):
+                yield dict(row._mapping)
+
+    def fetch_archived(self, notice_id: str) -> Optional[Dict]:
+        """Full archived notice, payload and child rows included."""
+        with self.archive_engine.connect() as connection:
+            row = connection.execute(select(archived_notices).where(archived_notices.c.id == notice_id)).first()
+            if row is None:
+                return None
+            record = dict(row._mapping)
+            for hot, archived in ARCHIVED_CHILDREN:
+                record[hot.name] = [
+                    dict(child._mapping)
+                    for child in connection.execute(select(archived).where(archived.c.notice_id == notice_id))
+                ]
+        return record
+
+
+def archiver_from_config(repository: NoticeRepository, config: Dict) -> Optional[NoticeArchiver]:
+    archive_cfg = config.get("archive", {})
+    if not archive_cfg.get("enabled", False):
+        return None
+    return NoticeArchiver(
+        repository,
+        archive_url=archive_cfg.get("archive_db_url") or os.getenv("ARCHIVE_DATABASE_URL"),
+        grace_days=int(archive_cfg.get("grace_days", 0)),
+        closed_statuses=archive_cfg.get("closed_statuses", DEFAULT_CLOSED_STATUSES),
+        batch_size=int(archive_cfg.get("batch_size", DEFAULT_ARCHIVE_BATCH_SIZE)),
+    )
+
+
+def parse_args(argv: Optional[Iterable[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive expired or closed notices")
+    parser.add_argument("--db", default=None, help="Override database URL")
+    parser.add_argument("--archive-db", default=None, help="Separate archive database URL (default: same database)")
+    parser.add_argument("--grace-days", type=int, default=None, help="Days past the deadline before archiving")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="Count what would be archived")
+    parser.add_argument(
+        "--packed-snapshot",
+        default=os.getenv("NOTICES_SNAPSHOT_PATH", DEFAULT_PACKED_PATH),
+        help="Packed notices snapshot republished for the API workers",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+    archive_cfg = load_scoring_config().get("archive", {})
+    repository = NoticeRepository(args.db or os.getenv("DATABASE_URL", "sqlite:///data/notices.db"))
+    archiver = NoticeArchiver(
+        repository,
+        archive_url=args.archive_db or archive_cfg.get("archive_db_url") or os.getenv("ARCHIVE_DATABASE_URL"),
+        grace_days=args.grace_days if args.grace_days is not None else int(archive_cfg.get("grace_days", 0)),
+        closed_statuses=archive_cfg.get("closed_statuses", DEFAULT_CLOSED_STATUSES),
+        batch_size=args.batch_size or int(archive_cfg.get("batch_size", DEFAULT_ARCHIVE_BATCH_SIZE)),
+    )
+    stats = archiver.run(dry_run=args.dry_run)
+    if not args.dry_run and stats.notices:
+        run_id = repository.record_run(archived=stats.notices)
+        publish_packed_snapshot(repository, args.packed_snapshot, run_id=run_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compressed binary column types for large, rarely-filtered notice payloads."""
+from __future__ import annotations
+
+import json
+import sys
+import zlib
+from array import array
+from typing import Any, List, Optional
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Stored blobs start with a NUL byte and a codec tag. JSON text never starts
+# with NUL, so values written before compression was introduced still decode.
+_ZLIB = b"\x00Z"
+_ZSTD = b"\x00S"
+_ZLIB_LEVEL = 6
+
+
+def compress(payload: bytes) -> bytes:
+    # Always zlib, so a database written on one host can be read on any other.
+    # zstd blobs are only decoded, and only where the optional zstandard is installed.
+    return _ZLIB + zlib.compress(payload, _ZLIB_LEVEL)
+
+
+def is_compressed(blob: bytes) -> bool:
+    return bytes(blob[:2]) in (_ZLIB, _ZSTD)
+
+
+def decompress(blob: bytes) -> bytes:
+    blob = bytes(blob)
+    tag, body = blob[:2], blob[2:]
+    if tag == _ZLIB:
+        return zlib.decompress(body)
+    if tag == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed notice data")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return blob
+
+
+def encode_json(value: Any) -> Optional[bytes]:
+    if value is None:
+        return None
+    return compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def decode_json(blob: Any) -> Any:
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return json.loads(blob)
+    return json.loads(decompress(blob).decode("utf-8"))
+
+
+def encode_vector(values: Optional[List[float]]) -> Optional[bytes]:
+    if values is None:
+        return None
+    packed = array("f", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return compress(packed.tobytes())
+
+
+def decode_vector(blob: Any) -> Optional[List[float]]:
+    if blob is None:
+        return None
+    if isinstance(blob, str) or not is_compressed(blob):
+        return decode_json(blob)
+    packed = array("f")
+    packed.frombytes(decompress(blob))
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tolist()
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON document stored as a compressed BLOB."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode_json(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_json(value)
+
+
+class CompressedVector(TypeDecorator):
+    """List of floats stored as compressed little-endian float32."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return encode_vector(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_vector(value)
@@ -30,6 +30,13 @@ DEFAULT_SCORING_CONFIG: Dict[str, Any] = {
         "skip_if_recent_days": 0,
         "enable_semantic": True,
     },
+    "archive": {
+        "enabled": False,
+        "grace_days": 0,
+        "closed_statuses": ["Closed", "Cancelled", "Awarded"],
+        "archive_db_url": None,
+        "batch_size": 500,
+    },
 }
 
 
@@ -4,69 +4,463 @@ Build semantic corpus from publications and push embeddings to Pinecone.
 from __future__ import annotations
 
 import argparse
+import bisect
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
+import queue
 import re
-from dataclasses import dataclass
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from multiprocessing.pool import AsyncResult
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import BadRequestError, OpenAI, RateLimitError
 from pinecone import Pinecone
 from pypdf import PdfReader
 import tiktoken
 
+from .minhash import NearDuplicateIndex, decode_signature, encode_signature
+
 LOGGER = logging.getLogger(__name__)
 
 DEFAULT_MAX_TOKENS = 600
 DEFAULT_OVERLAP = 100
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_INGEST_MANIFEST = "data/ingest_manifest.json"
+INGEST_MANIFEST_VERSION = 1
+DEFAULT_EXTRACT_TIMEOUT = 120.0
+DEFAULT_QUEUE_BATCHES = 4
+DEFAULT_BATCH_INPUTS = 256
+DEFAULT_BATCH_TOKENS = 64_000
+MIN_BATCH_TOKENS = 2_000
+MAX_BATCH_TOKENS = 250_000
+DEFAULT_EMBED_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 3_000
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+MAX_EMBED_ATTEMPTS = 8
+# Pinecone serverless allows about 100 updates per second per namespace.
+DEFAULT_INDEX_UPDATES_PER_MINUTE = 6_000
+MAX_UPDATE_ATTEMPTS = 5
+REF_UPDATE_PROGRESS_EVERY = 500
+DEFAULT_DUPLICATE_THRESHOLD = 0.85
 
 
 @dataclass
 class DocumentChunk:
     chunk_id: str
     text: str
+    metadata: Dict[str, object]
+    duplicate_of: Optional[str] = None
+    signature: str = ""
+
+
+@dataclass
+class ChunkSpan:
+    """A token window of a document, located by character offset and 1-based page number."""
+
+    text: str
+    token_start: int
+    token_end: int
+    char_start: int
+    char_end: int
+    page_start: int
+    page_end: int
+    tokens: Sequence[int] = field(default=(), repr=False)
+
+    @property
+    def token_count(self) -> int:
+        return self.token_end - self.token_start
+
+
+@dataclass
+class SourceDocument:
+    doc_id: str
+    path: Path
+    source_type: str
     metadata: Dict[str, str]
+    content_hash: str = ""
+    duplicate_of: Optional[str] = None
+
+
+@dataclass
+class ExtractedDocument:
+    source: SourceDocument
+    pages: List[str]
+    seconds: float
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+
+@dataclass
+class IngestManifest:
+    """
+    Record of what each source document produced on its last successful ingest.
+
+    Entries are keyed by doc id and hold the file hash, the chunking/embedding
+    parameters and the chunk ids upserted to Pinecone, so unchanged documents can
+    be skipped and stale vectors deleted. While a document is being ingested its
+    entry is marked incomplete and checkpointed after every upserted batch, so an
+    interrupted run resumes without re-embedding what already reached the index.
+
+    Near-duplicate bookkeeping lives here too: each entry keeps the MinHash
+    signatures of the chunks it owns, the canonical chunk ids its own duplicate
+    chunks were folded into (``aliases``) or, for byte-identical files, the
+    document it duplicates (``duplicate_of``). ``ref_updates`` lists canonical
+    vectors whose duplicate-source metadata still has to be refreshed.
+    """
+
+    path: Path
+    documents: Dict[str, Dict] = field(default_factory=dict)
+    ref_updates: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestManifest":
+        if not path.exists():
+            return cls(path=path)
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if payload.get("version") != INGEST_MANIFEST_VERSION:
+            LOGGER.warning("Ignoring ingest manifest with unknown version: %s", path)
+            return cls(path=path)
+        return cls(
+            path=path,
+            documents=payload.get("documents", {}),
+            ref_updates=set(payload.get("ref_updates", [])),
+        )
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": INGEST_MANIFEST_VERSION,
+            "documents": self.documents,
+            "ref_updates": sorted(self.ref_updates),
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def is_current(self, source: SourceDocument, params: Dict[str, object]) -> bool:
+        return self._matches(source, params) and self.documents[source.doc_id].get("complete", True)
+
+    def _matches(self, source: SourceDocument, params: Dict[str, object]) -> bool:
+        entry = self.documents.get(source.doc_id)
+        if not entry:
+            return False
+        return entry.get("content_hash") == source.content_hash and entry.get("params") == params
+
+    def chunk_ids(self, doc_id: str) -> List[str]:
+        return list(self.documents.get(doc_id, {}).get("chunk_ids", []))
+
+    def resume_ids(self, source: SourceDocument, params: Dict[str, object]) -> Set[str]:
+        """Chunk ids an interrupted run already upserted for this exact document version."""
+        if not self._matches(source, params) or self.documents[source.doc_id].get("complete", True):
+            return set()
+        return set(self.documents[source.doc_id].get("chunk_ids", []))
+
+    def checkpoint(
+        self,
+        source: SourceDocument,
+        params: Dict[str, object],
+        upserted_ids: Iterable[str],
+    ) -> None:
+        """Mark chunk ids as upserted for a document whose ingest is still in progress."""
+        entry = self.documents.get(source.doc_id)
+        if entry is None or not self._matches(source, params) or entry.get("complete", True):
+            previous = entry or {}
+            entry = {
+                "source_path": source.metadata.get("source_path", ""),
+                "content_hash": source.content_hash,
+                "params": params,
+                "chunk_ids": [],
+                "complete": False,
+                "pending_delete": previous.get("pending_delete", []) + previous.get("chunk_ids", []),
+            }
+            self.documents[source.doc_id] = entry
+        known = set(entry["chunk_ids"])
+        entry["chunk_ids"].extend(chunk_id for chunk_id in upserted_ids if chunk_id not in known)
+
+    def stale_ids(self, source: SourceDocument, chunk_ids: Iterable[str]) -> List[str]:
+        """Previously upserted ids for this document that its new chunking no longer produces."""
+        entry = self.documents.get(source.doc_id, {})
+        keep = set(chunk_ids)
+        previous = entry.get("pending_delete", []) + entry.get("chunk_ids", [])
+        return sorted({chunk_id for chunk_id in previous if chunk_id not in keep})
+
+    def record(
+        self,
+        source: SourceDocument,
+        params: Dict[str, object],
+        chunk_ids: List[str],
+        signatures: Optional[Dict[str, str]] = None,
+        aliases: Optional[Dict[str, str]] = None,
+    ) -> None:
+        entry = {
+            "source_path": source.metadata.get("source_path", ""),
+            "source_url": source.metadata.get("source_url", ""),
+            "source_title": source.metadata.get("source_title", ""),
+            "content_hash": source.content_hash,
+            "params": params,
+            "chunk_ids": chunk_ids,
+            "complete": True,
+        }
+        if signatures:
+            entry["signatures"] = signatures
+        if aliases:
+            entry["aliases"] = aliases
+        if source.duplicate_of:
+            entry["duplicate_of"] = source.duplicate_of
+        self.documents[source.doc_id] = entry
+
+    def remove(self, doc_id: str) -> None:
+        self.documents.pop(doc_id, None)
+
+    def referenced_ids(self, doc_id: str) -> Set[str]:
+        """Canonical chunk ids whose duplicate references include this document."""
+        entry = self.documents.get(doc_id, {})
+        referenced = set(entry.get("aliases", {}).values())
+        if entry.get("duplicate_of"):
+            referenced.update(self.chunk_ids(entry["duplicate_of"]))
+        return referenced
+
+    def seed(self, index: NearDuplicateIndex, exclude: Set[str]) -> None:
+        for doc_id, entry in self.documents.items():
+            if doc_id in exclude or not entry.get("complete", True):
+                continue
+            for chunk_id, signature in entry.get("signatures", {}).items():
+                index.add(chunk_id, decode_signature(signature))
+
+    def owned_ids(self) -> Set[str]:
+        return {chunk_id for entry in self.documents.values() for chunk_id in entry.get("chunk_ids", [])}
+
+    def duplicate_refs(self) -> Dict[str, List[Dict[str, str]]]:
+        """Map canonical chunk id -> the other documents that contain it."""
+        refs: Dict[str, List[Dict[str, str]]] = {}
+        for doc_id, entry in self.documents.items():
+            own = set(entry.get("chunk_ids", []))
+            ref = {
+                "doc_id": doc_id,
+                "source_url": entry.get("source_url", ""),
+                "source_title": entry.get("source_title", ""),
+            }
+            for chunk_id in sorted(self.referenced_ids(doc_id) - own):
+                refs.setdefault(chunk_id, []).append(ref)
+        return refs
 
 
 def slugify(value: str) -> str:
     return re.sub(r"[^a-zA-Z0-9]+", "-", value).strip("-").lower()
 
 
-def extract_text_from_pdf(path: Path) -> str:
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ingest_params(
+    max_tokens: int,
+    overlap_tokens: int,
+    embedding_model: str,
+    encoding_name: str = DEFAULT_ENCODING,
+) -> Dict[str, object]:
+    """Parameters that, when changed, invalidate every previously produced chunk."""
+    return {
+        "max_tokens": max_tokens,
+        "overlap_tokens": overlap_tokens,
+        "encoding": encoding_name,
+        "embedding_model": embedding_model,
+    }
+
+
+def extract_pages_from_pdf(path: Path) -> List[str]:
     reader = PdfReader(str(path))
-    texts: List[str] = []
+    pages: List[str] = []
     for page in reader.pages:
         try:
             content = page.extract_text() or ""
         except Exception:  # pylint: disable=broad-except
             content = ""
-        texts.append(content)
-    return "\n".join(texts)
+        pages.append(content)
+    return pages
 
 
-def chunk_text(
-    text: str,
+def extract_text_from_pdf(path: Path) -> str:
+    return "\n".join(extract_pages_from_pdf(path))
+
+
+def _extract_pages(source_type: str, path: str) -> Tuple[List[str], float]:
+    """Worker entry point for the extraction pool; must stay importable at module level."""
+    started = time.perf_counter()
+    if source_type == "publication_pdf":
+        pages = extract_pages_from_pdf(Path(path))
+    else:
+        pages = [Path(path).read_text(encoding="utf-8")]
+    return pages, time.perf_counter() - started
+
+
+def iter_extracted(
+    sources: Iterable[SourceDocument],
+    workers: Optional[int] = None,
+    timeout: float = DEFAULT_EXTRACT_TIMEOUT,
+) -> Iterator[ExtractedDocument]:
+    """
+    Extract source documents in a process pool, yielding them in input order.
+
+    At most ``2 * workers`` documents are in flight so results stream back without
+    buffering the corpus. A document that fails, or is not finished ``timeout``
+    seconds after its turn comes up, is logged and skipped; the pool is then
+    recycled so a hung parser cannot hold on to a worker.
+    """
+    pending = list(sources)
+    if not pending:
+        return
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    window = workers * 2
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(processes=workers)
+    in_flight: List[Tuple[SourceDocument, AsyncResult]] = []
+    next_index = 0
+    started = time.perf_counter()
+    total_pages = 0
+    total_docs = 0
+
+    def submit(source: SourceDocument):
+        return pool.apply_async(_extract_pages, (source.source_type, str(source.path)))
+
+    try:
+        while in_flight or next_index < len(pending):
+            while next_index < len(pending) and len(in_flight) < window:
+                source = pending[next_index]
+                in_flight.append((source, submit(source)))
+                next_index += 1
+
+            source, result = in_flight.pop(0)
+            try:
+                pages, seconds = result.get(timeout=timeout)
+            except multiprocessing.TimeoutError:
+                LOGGER.warning("Extraction timed out after %.1fs: %s", timeout, source.path)
+                pool.terminate()
+                pool = context.Pool(processes=workers)
+                in_flight = [(queued, submit(queued)) for queued, _ in in_flight]
+                continue
+            except Exception as exc:  # pylint: disable=broad-except
+                LOGGER.warning("Extraction failed for %s: %s", source.path, exc)
+                continue
+
+            total_docs += 1
+            total_pages += len(pages)
+            LOGGER.debug(
+                "Extracted %s (%s pages) in %.2fs",
+                source.path.name,
+                len(pages),
+                seconds,
+            )
+            yield ExtractedDocument(source=source, pages=pages, seconds=seconds)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    LOGGER.info(
+        "Extracted %s/%s documents (%s pages) in %.1fs with %s workers - %.1f pages/sec",
+        total_docs,
+        len(pending),
+        total_pages,
+        elapsed,
+        workers,
+        total_pages / elapsed,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
+
+
+def chunk_spans(
+    pages: Sequence[str],
     max_tokens: int = DEFAULT_MAX_TOKENS,
     overlap_tokens: int = DEFAULT_OVERLAP,
-    encoding_name: str = "cl100k_base",
-) -> Iterable[str]:
-    encoding = tiktoken.get_encoding(encoding_name)
-    tokens = encoding.encode(text)
-    if not tokens:
-        return []
+    encoding_name: str = DEFAULT_ENCODING,
+) -> List[ChunkSpan]:
+    """
+    Split pages (joined by newlines) into overlapping token windows.
+
+    The document is encoded once; each window's text is sliced from the source
+    using the token character offsets rather than re-decoded, and its token count
+    is the window length, so nothing is tokenized twice.
+    """
     step = max_tokens - overlap_tokens
     if step <= 0:
         raise ValueError("max_tokens must be greater than overlap_tokens")
-    chunks: List[str] = []
+    text = "\n".join(pages)
+    encoding = get_encoding(encoding_name)
+    tokens = encoding.encode(text)
+    if not tokens:
+        return []
+    _, offsets = encoding.decode_with_offsets(tokens)
+
+    page_starts: List[int] = []
+    position = 0
+    for page in pages:
+        page_starts.append(position)
+        position += len(page) + 1
+
+    def page_of(char_offset: int) -> int:
+        return bisect.bisect_right(page_starts, char_offset)
+
+    spans: List[ChunkSpan] = []
     for start in range(0, len(tokens), step):
-        window = tokens[start : start + max_tokens]
-        chunk = encoding.decode(window).strip()
+        end = min(start + max_tokens, len(tokens))
+        char_start = offsets[start]
+        char_end = offsets[end] if end < len(tokens) else len(text)
+        window = text[char_start:char_end]
+        chunk = window.strip()
         if chunk:
-            chunks.append(chunk)
-    return chunks
+            char_start += len(window) - len(window.lstrip())
+            char_end = char_start + len(chunk)
+            spans.append(
+                ChunkSpan(
+                    text=chunk,
+                    token_start=start,
+                    token_end=end,
+                    char_start=char_start,
+                    char_end=char_end,
+                    page_start=page_of(char_start),
+                    page_end=page_of(char_end - 1),
+                    tokens=tokens[start:end],
+                )
+            )
+        if end == len(tokens):
+            break
+    return spans
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP,
+    encoding_name: str = DEFAULT_ENCODING,
+) -> Iterable[str]:
+    spans = chunk_spans(
+        [text],
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        encoding_name=encoding_name,
+    )
+    return [span.text for span in spans]
 
 
 def load_manifest(path: Path) -> List[Dict[str, str]]:
@@ -76,81 +470,253 @@ def load_manifest(path: Path) -> List[Dict[str, str]]:
     return json.loads(path.read_text(encoding="utf-8"))
 
 
-def collect_documents(
-    base_dir: Path,
-    max_tokens: int,
-    overlap_tokens: int,
-    encoding_name: str = "cl100k_base",
-) -> List[DocumentChunk]:
+def list_sources(base_dir: Path) -> List[SourceDocument]:
+    """Resolve both manifests into source documents, hashing each file's contents."""
     publications_manifest = load_manifest(base_dir / "publications" / "manifest.json")
     articles_manifest = load_manifest(base_dir / "publications" / "articles" / "manifest.json")
 
-    documents: List[DocumentChunk] = []
-
-    encoding = tiktoken.get_encoding(encoding_name)
-
-    def process_text(
-        doc_id: str,
-        raw_text: str,
-        metadata: Dict[str, str],
-    ) -> None:
-        chunks = chunk_text(
-            raw_text,
-            max_tokens=max_tokens,
-            overlap_tokens=overlap_tokens,
-            encoding_name=encoding_name,
-        )
-        for index, chunk in enumerate(chunks):
-            tokens = encoding.encode(chunk)
-            chunk_id = f"{doc_id}-{index:03d}"
-            chunk_meta = {
-                **metadata,
-                "doc_id": doc_id,
-                "chunk_index": str(index),
-                "chunk_char_count": str(len(chunk)),
-                "chunk_token_count": str(len(tokens)),
-                "chunk_text": chunk,
-            }
-            documents.append(DocumentChunk(chunk_id=chunk_id, text=chunk, metadata=chunk_meta))
+    sources: List[SourceDocument] = []
 
     for item in publications_manifest:
         path = base_dir / item["file"]
         if not path.exists():
             LOGGER.warning("PDF not found: %s", path)
             continue
-        raw_text = extract_text_from_pdf(path)
-        doc_id = slugify(path.stem)
         source_title = re.sub(r"[-_]+", " ", path.stem).strip().title()
-        metadata = {
-            "source_type": "publication_pdf",
-            "source_url": item.get("url", ""),
-            "source_path": str(path.relative_to(base_dir)),
-            "file_name": path.name,
-            "source_title": source_title,
-        }
-        process_text(doc_id, raw_text, metadata)
+        sources.append(
+            SourceDocument(
+                doc_id=slugify(path.stem),
+                path=path,
+                source_type="publication_pdf",
+                metadata={
+                    "source_type": "publication_pdf",
+                    "source_url": item.get("url", ""),
+                    "source_path": str(path.relative_to(base_dir)),
+                    "file_name": path.name,
+                    "source_title": source_title,
+                },
+                content_hash=file_sha256(path),
+            )
+        )
 
     for item in articles_manifest:
         text_path = base_dir / item["text_file"]
         if not text_path.exists():
             LOGGER.warning("Article text not found: %s", text_path)
             continue
-        raw_text = text_path.read_text(encoding="utf-8")
-        doc_id = slugify(Path(item["text_file"]).stem)
         source_title = re.sub(r"[-_]+", " ", Path(item["text_file"]).stem).strip().title()
-        metadata = {
-            "source_type": "publication_article",
-            "source_url": item.get("url", ""),
-            "source_path": item.get("text_file", ""),
-            "file_name": Path(item.get("html_file", "")).name,
-            "source_title": source_title,
+        sources.append(
+            SourceDocument(
+                doc_id=slugify(Path(item["text_file"]).stem),
+                path=text_path,
+                source_type="publication_article",
+                metadata={
+                    "source_type": "publication_article",
+                    "source_url": item.get("url", ""),
+                    "source_path": item.get("text_file", ""),
+                    "file_name": Path(item.get("html_file", "")).name,
+                    "source_title": source_title,
+                },
+                content_hash=file_sha256(text_path),
+            )
+        )
+
+    return sources
+
+
+def plan_ingest(
+    sources: List[SourceDocument],
+    manifest: IngestManifest,
+    params: Dict[str, object],
+    full: bool = False,
+) -> Tuple[List[SourceDocument], List[str]]:
+    """
+    Decide which documents need (re)ingesting and which were removed.
+
+    Byte-identical files are marked ``duplicate_of`` the first copy in source
+    order and are never extracted. A document whose chunks were folded into
+    chunks of a changed or removed document is reprocessed as well, so its
+    aliases never point at vectors that no longer exist.
+    """
+    current_ids = {source.doc_id for source in sources}
+    removed = [doc_id for doc_id in manifest.documents if doc_id not in current_ids]
+
+    first_by_hash: Dict[str, str] = {}
+    for source in sources:
+        canonical = first_by_hash.setdefault(source.content_hash, source.doc_id)
+        source.duplicate_of = canonical if canonical != source.doc_id else None
+
+    dirty = set(removed)
+    for source in sources:
+        entry = manifest.documents.get(source.doc_id, {})
+        if full or not manifest.is_current(source, params) or entry.get("duplicate_of") != source.duplicate_of:
+            dirty.add(source.doc_id)
+
+    changed = True
+    while changed:
+        changed = False
+        dirty_chunks = {chunk_id for doc_id in dirty for chunk_id in manifest.chunk_ids(doc_id)}
+        for source in sources:
+            if source.doc_id in dirty:
+                continue
+            entry = manifest.documents.get(source.doc_id, {})
+            if entry.get("duplicate_of") in dirty or dirty_chunks.intersection(entry.get("aliases", {}).values()):
+                dirty.add(source.doc_id)
+                changed = True
+
+    return [source for source in sources if source.doc_id in dirty], removed
+
+
+def duplicate_metadata(refs: List[Dict[str, str]]) -> Dict[str, List[str]]:
+    return {
+        "duplicate_doc_ids": [ref["doc_id"] for ref in refs],
+        "duplicate_source_urls": [ref.get("source_url", "") for ref in refs],
+        "duplicate_source_titles": [ref.get("source_title", "") for ref in refs],
+    }
+
+
+def chunk_document(
+    extracted: ExtractedDocument,
+    max_tokens: int,
+    overlap_tokens: int,
+    encoding_name: str = DEFAULT_ENCODING,
+    deduplicator: Optional[NearDuplicateIndex] = None,
+) -> List[DocumentChunk]:
+    """
+    Split a document into chunks.
+
+    With a ``deduplicator`` every chunk is MinHashed; a chunk that nearly matches
+    one seen earlier gets ``duplicate_of`` set to that chunk's id instead of
+    being registered itself.
+    """
+    source = extracted.source
+    spans = chunk_spans(
+        extracted.pages,
+        max_tokens=max_tokens,
+        overlap_tokens=overlap_tokens,
+        encoding_name=encoding_name,
+    )
+    documents: List[DocumentChunk] = []
+    for index, span in enumerate(spans):
+        chunk_id = f"{source.doc_id}-{index:03d}"
+        chunk_meta = {
+            **source.metadata,
+            "doc_id": source.doc_id,
+            "chunk_index": str(index),
+            "chunk_char_count": str(len(span.text)),
+            "chunk_token_count": str(span.token_count),
+            "chunk_char_start": str(span.char_start),
+            "chunk_char_end": str(span.char_end),
+            "chunk_text": span.text,
         }
-        process_text(doc_id, raw_text, metadata)
+        if source.source_type == "publication_pdf":
+            chunk_meta["page_start"] = str(span.page_start)
+            chunk_meta["page_end"] = str(span.page_end)
+        chunk = DocumentChunk(chunk_id=chunk_id, text=span.text, metadata=chunk_meta)
+        if deduplicator is not None:
+            signature = deduplicator.signature(span.tokens)
+            chunk.signature = encode_signature(signature)
+            chunk.duplicate_of = deduplicator.find(signature)
+            if chunk.duplicate_of is None:
+                deduplicator.add(chunk_id, signature)
+        documents.append(chunk)
+    return documents
+
+
+def collect_documents(
+    base_dir: Path,
+    max_tokens: int,
+    overlap_tokens: int,
+    encoding_name: str = DEFAULT_ENCODING,
+    sources: Optional[Iterable[SourceDocument]] = None,
+    extract_workers: Optional[int] = None,
+    extract_timeout: float = DEFAULT_EXTRACT_TIMEOUT,
+    deduplicate: bool = False,
+    duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+) -> List[DocumentChunk]:
+    """
+    Extract and chunk the corpus in memory.
 
+    With ``deduplicate`` byte-identical files are extracted once and near-duplicate
+    chunks are dropped; the surviving chunk lists every other document it
+    appeared in under the ``duplicate_*`` metadata keys.
+    """
+    if sources is None:
+        sources = list_sources(base_dir)
+    sources = list(sources)
+
+    copies: Dict[str, List[SourceDocument]] = {}
+    if deduplicate:
+        first_by_hash: Dict[str, SourceDocument] = {}
+        unique: List[SourceDocument] = []
+        for source in sources:
+            first = first_by_hash.setdefault(source.content_hash or source.doc_id, source)
+            if first is source:
+                unique.append(source)
+            else:
+                copies.setdefault(first.doc_id, []).append(source)
+        sources = unique
+    deduplicator = NearDuplicateIndex(threshold=duplicate_threshold) if deduplicate else None
+
+    documents: List[DocumentChunk] = []
+    refs: Dict[str, List[Dict[str, str]]] = {}
+    owners: Dict[str, str] = {}
+    duplicates = 0
+    for extracted in iter_extracted(sources, workers=extract_workers, timeout=extract_timeout):
+        source = extracted.source
+        doc_refs = [
+            {"doc_id": copy.doc_id, **{key: copy.metadata.get(key, "") for key in ("source_url", "source_title")}}
+            for copy in copies.get(source.doc_id, [])
+        ]
+        for chunk in chunk_document(
+            extracted,
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            encoding_name=encoding_name,
+            deduplicator=deduplicator,
+        ):
+            if chunk.duplicate_of is None:
+                refs[chunk.chunk_id] = list(doc_refs)
+                owners[chunk.chunk_id] = source.doc_id
+                documents.append(chunk)
+                continue
+            duplicates += 1
+            canonical_refs = refs[chunk.duplicate_of]
+            if source.doc_id != owners[chunk.duplicate_of] and all(
+                ref["doc_id"] != source.doc_id for ref in canonical_refs
+            ):
+                canonical_refs.append(
+                    {
+                        "doc_id": source.doc_id,
+                        "source_url": source.metadata.get("source_url", ""),
+                        "source_title": source.metadata.get("source_title", ""),
+                    }
+                )
+
+    if deduplicate:
+        for chunk in documents:
+            if refs[chunk.chunk_id]:
+                chunk.metadata.update(duplicate_metadata(refs[chunk.chunk_id]))
+        LOGGER.info(
+            "Dropped %s near-duplicate chunks and %s duplicate documents",
+            duplicates,
+            sum(len(group) for group in copies.values()),
+        )
     LOGGER.info("Prepared %s chunks from corpus", len(documents))
     return documents
 
 
+def _to_vectors(model: str, chunks: List[DocumentChunk], embeddings: Iterable) -> List[Dict]:
+    return [
+        {
+            "id": chunk.chunk_id,
+            "values": embedding.embedding,
+            "metadata": {**chunk.metadata, "embedding_model": model},
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+
+
 def embed_chunks(
     client: OpenAI,
     model: str,
@@ -163,17 +729,173 @@ def embed_chunks(
         texts = [chunk.text for chunk in batch]
         LOGGER.info("Embedding batch %s - %s", start, start + len(batch))
         response = client.embeddings.create(model=model, input=texts)
-        for chunk, embedding in zip(batch, response.data):
-            vectors.append(
-                {
-                    "id": chunk.chunk_id,
-                    "values": embedding.embedding,
-                    "metadata": {**chunk.metadata, "embedding_model": model},
-                }
-            )
+        vectors.extend(_to_vectors(model, batch, response.data))
     return vectors
 
 
+def _chunk_tokens(chunk: DocumentChunk) -> int:
+    return int(chunk.metadata.get("chunk_token_count", 0))
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter over requests and tokens per minute, shared by threads.
+
+    ``pause`` stops every caller for a while, e.g. after the API answers 429.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._updated = now
+                self._requests = min(
+                    self.requests_per_minute,
+                    self._requests + elapsed * self.requests_per_minute / 60,
+                )
+                self._tokens = min(
+                    self.tokens_per_minute,
+                    self._tokens + elapsed * self.tokens_per_minute / 60,
+                )
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._requests >= 1 and self._tokens >= tokens:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        return
+                    wait = max(
+                        (1 - self._requests) * 60 / self.requests_per_minute,
+                        (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                    )
+            time.sleep(min(max(wait, 0.01), 5.0))
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveBatchBudget:
+    """Per-request token budget that halves on rejection and creeps back up on success."""
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_BATCH_TOKENS,
+        minimum: int = MIN_BATCH_TOKENS,
+        maximum: int = MAX_BATCH_TOKENS,
+        grow_after: int = 4,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.value = min(max(initial, minimum), self.maximum)
+        self.grow_after = grow_after
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def shrink(self) -> None:
+        with self._lock:
+            self.value = max(self.minimum, self.value // 2)
+            self._successes = 0
+            LOGGER.info("Embedding batch budget reduced to %s tokens", self.value)
+
+    def succeed(self) -> None:
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.grow_after and self.value < self.maximum:
+                self.value = min(self.maximum, int(self.value * 1.25))
+                self._successes = 0
+
+
+class ChunkEmbedder:
+    """
+    Embeds token-budgeted batches under a shared rate limiter.
+
+    A 429 pauses all requests (honouring Retry-After) and shrinks the budget; a
+    request rejected for exceeding the token limit is split in half and retried.
+    """
+
+    def __init__(
+        self,
+        client: OpenAI,
+        model: str,
+        limiter: RateLimiter,
+        budget: AdaptiveBatchBudget,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.limiter = limiter
+        self.budget = budget
+        self.tokens = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def embed(self, chunks: List[DocumentChunk]) -> List[Dict]:
+        started = time.perf_counter()
+        vectors: List[Dict] = []
+        pending: List[List[DocumentChunk]] = [chunks]
+        attempts = 0
+        while pending:
+            batch = pending.pop(0)
+            tokens = sum(_chunk_tokens(chunk) for chunk in batch)
+            self.limiter.acquire(tokens)
+            try:
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=[chunk.text for chunk in batch],
+                )
+            except RateLimitError as exc:
+                attempts += 1
+                if attempts >= MAX_EMBED_ATTEMPTS:
+                    raise
+                self.budget.shrink()
+                self.limiter.pause(_retry_after(exc, attempts))
+                pending[:0] = _split_batch(batch) if tokens > self.budget.value else [batch]
+                continue
+            except BadRequestError as exc:
+                if len(batch) < 2 or "token" not in str(exc).lower():
+                    raise
+                self.budget.shrink()
+                pending[:0] = _split_batch(batch)
+                continue
+            attempts = 0
+            self.budget.succeed()
+            vectors.extend(_to_vectors(self.model, batch, response.data))
+            with self._lock:
+                self.tokens += tokens
+                self.requests += 1
+
+        LOGGER.info(
+            "Embedded %s chunks (%s tokens) in %.2fs",
+            len(chunks),
+            sum(_chunk_tokens(chunk) for chunk in chunks),
+            time.perf_counter() - started,
+        )
+        return vectors
+
+
+def _split_batch(batch: List[DocumentChunk]) -> List[List[DocumentChunk]]:
+    middle = max(1, len(batch) // 2)
+    return [part for part in (batch[:middle], batch[middle:]) if part]
+
+
+def _retry_after(exc: RateLimitError, attempt: int) -> float:
+    header = exc.response.headers.get("retry-after") if exc.response is not None else None
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        return min(60.0, 2.0 ** attempt)
+
+
 def upsert_vectors(index, vectors: List[Dict], batch_size: int = 100) -> None:
     for start in range(0, len(vectors), batch_size):
         batch = vectors[start : start + batch_size]
@@ -181,12 +903,423 @@ def upsert_vectors(index, vectors: List[Dict], batch_size: int = 100) -> None:
         index.upsert(vectors=batch)
 
 
+def delete_vectors(index, ids: List[str], batch_size: int = 1000) -> None:
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start : start + batch_size]
+        LOGGER.info("Deleting %s stale vectors", len(batch))
+        index.delete(ids=batch)
+
+
+@dataclass
+class _DocumentDone:
+    source: SourceDocument
+    chunk_ids: List[str]
+    signatures: Dict[str, str] = field(default_factory=dict)
+    aliases: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _VectorBatch:
+    vectors: List[Dict]
+    completed: List[_DocumentDone]
+
+
+class _PipelineAborted(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+_END_OF_STREAM = object()
+
+
+@dataclass
+class IngestStats:
+    documents: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    resumed_chunks: int = 0
+    duplicate_chunks: int = 0
+    embed_requests: int = 0
+    embedded_tokens: int = 0
+    embed_seconds: float = 0.0
+    vectors_upserted: int = 0
+    vectors_deleted: int = 0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.embedded_tokens / self.embed_seconds if self.embed_seconds else 0.0
+
+
+class IngestPipeline:
+    """
+    Streaming extract -> chunk -> embed -> upsert ingest.
+
+    Each stage runs in its own thread and hands work to the next through a
+    bounded queue, so embedding requests go out while PDFs are still being parsed
+    and upserts overlap with embedding, with at most a few batches held in memory.
+    Embedding batches are sized by token budget and several run concurrently;
+    they are handed to the upsert stage in submission order. The ingest manifest
+    is checkpointed after every upserted batch.
+
+    With a ``deduplicator`` near-duplicate chunks are never embedded; the manifest
+    records the canonical chunk they were folded into and queues that vector for
+    a duplicate-reference metadata update (see ``apply_reference_updates``).
+    """
+
+    def __init__(
+        self,
+        manifest: IngestManifest,
+        params: Dict[str, object],
+        index,
+        client: OpenAI,
+        embedding_model: str,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP,
+        batch_size: int = DEFAULT_BATCH_INPUTS,
+        batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        embed_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        extract_workers: Optional[int] = None,
+        extract_timeout: float = DEFAULT_EXTRACT_TIMEOUT,
+        queue_batches: int = DEFAULT_QUEUE_BATCHES,
+        deduplicator: Optional[NearDuplicateIndex] = None,
+    ) -> None:
+        self.manifest = manifest
+        self.params = params
+        self.index = index
+        self.client = client
+        self.embedding_model = embedding_model
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.batch_size = batch_size
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.embedder = ChunkEmbedder(
+            client,
+            embedding_model,
+            limiter=RateLimiter(requests_per_minute, tokens_per_minute),
+            budget=AdaptiveBatchBudget(
+                initial=batch_tokens,
+                maximum=max(batch_tokens, min(MAX_BATCH_TOKENS, tokens_per_minute)),
+            ),
+        )
+        self.extract_workers = extract_workers
+        self.extract_timeout = extract_timeout
+        self.deduplicator = deduplicator
+        self._copied_docs = {
+            entry["duplicate_of"] for entry in manifest.documents.values() if entry.get("duplicate_of")
+        }
+        self.stats = IngestStats()
+        self._chunks: queue.Queue = queue.Queue(maxsize=batch_size * queue_batches)
+        self._batches: queue.Queue = queue.Queue(maxsize=queue_batches)
+        self._sources: Dict[str, SourceDocument] = {}
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def run(self, sources: List[SourceDocument]) -> IngestStats:
+        stages = [
+            threading.Thread(target=self._guard, args=(self._produce, sources), name="ingest-extract"),
+            threading.Thread(target=self._guard, args=(self._embed,), name="ingest-embed"),
+            threading.Thread(target=self._guard, args=(self._upsert,), name="ingest-upsert"),
+        ]
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
+
+    def _guard(self, target, *args) -> None:
+        try:
+            target(*args)
+        except _PipelineAborted:
+            pass
+        except BaseException as exc:  # pylint: disable=broad-except
+            LOGGER.error("Ingest stage %s failed: %s", threading.current_thread().name, exc)
+            self._errors.append(exc)
+            self._stop.set()
+
+    def _put(self, target: queue.Queue, item) -> None:
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise _PipelineAborted()
+
+    def _get(self, source: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        raise _PipelineAborted()
+
+    def _produce(self, sources: List[SourceDocument]) -> None:
+        try:
+            for extracted in iter_extracted(
+                sources,
+                workers=self.extract_workers,
+                timeout=self.extract_timeout,
+            ):
+                if self._stop.is_set():
+                    raise _PipelineAborted()
+                chunks = chunk_document(
+                    extracted,
+                    max_tokens=self.max_tokens,
+                    overlap_tokens=self.overlap_tokens,
+                    encoding_name=str(self.params["encoding"]),
+                    deduplicator=self.deduplicator,
+                )
+                already_upserted = self.manifest.resume_ids(extracted.source, self.params)
+                self._sources[extracted.source.doc_id] = extracted.source
+                self.stats.documents += 1
+                done = _DocumentDone(extracted.source, [])
+                for chunk in chunks:
+                    self.stats.chunks += 1
+                    self.stats.tokens += int(chunk.metadata["chunk_token_count"])
+                    if chunk.duplicate_of is not None:
+                        self.stats.duplicate_chunks += 1
+                        done.aliases[chunk.chunk_id] = chunk.duplicate_of
+                        continue
+                    done.chunk_ids.append(chunk.chunk_id)
+                    if chunk.signature:
+                        done.signatures[chunk.chunk_id] = chunk.signature
+                    if chunk.chunk_id in already_upserted:
+                        self.stats.resumed_chunks += 1
+                        continue
+                    self._put(self._chunks, chunk)
+                self._put(self._chunks, done)
+        finally:
+            if not self._stop.is_set():
+                self._put(self._chunks, _END_OF_STREAM)
+
+    def _poll(self, source: queue.Queue, timeout: float):
+        try:
+            return source.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _embed(self) -> None:
+        pending: List[DocumentChunk] = []
+        pending_tokens = 0
+        completed: List[_DocumentDone] = []
+        in_flight: deque = deque()
+        started: Optional[float] = None
+
+        def dispatch() -> None:
+            nonlocal pending, pending_tokens, completed, started
+            if started is None:
+                started = time.perf_counter()
+            future: Optional[Future] = executor.submit(self.embedder.embed, pending) if pending else None
+            in_flight.append((future, completed))
+            pending, pending_tokens, completed = [], 0, []
+
+        def forward(block: bool) -> None:
+            while in_flight and (block or in_flight[0][0] is None or in_flight[0][0].done()):
+                future, done = in_flight.popleft()
+                vectors = future.result() if future is not None else []
+                self._put(self._batches, _VectorBatch(vectors=vectors, completed=done))
+                block = False
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency, thread_name_prefix="ingest-embed") as executor:
+            try:
+                while True:
+                    forward(block=len(in_flight) >= self.embed_concurrency * 2)
+                    item = self._poll(self._chunks, timeout=0.1)
+                    if self._stop.is_set():
+                        raise _PipelineAborted()
+                    if item is None:
+                        continue
+                    if item is _END_OF_STREAM:
+                        if pending or completed:
+                            dispatch()
+                        while in_flight:
+                            forward(block=True)
+                        self._put(self._batches, _END_OF_STREAM)
+                        break
+                    if isinstance(item, _DocumentDone):
+                        completed.append(item)
+                        if not pending:
+                            dispatch()
+                        continue
+                    tokens = _chunk_tokens(item)
+                    if pending and (
+                        pending_tokens + tokens > self.embedder.budget.value or len(pending) >= self.batch_size
+                    ):
+                        dispatch()
+                    pending.append(item)
+                    pending_tokens += tokens
+            finally:
+                for future, _ in in_flight:
+                    if future is not None:
+                        future.cancel()
+
+        if started is not None:
+            self.stats.embed_seconds = time.perf_counter() - started
+        self.stats.embed_requests = self.embedder.requests
+        self.stats.embedded_tokens = self.embedder.tokens
+        LOGGER.info(
+            "Embedded %s tokens in %s requests over %.1fs - %.0f tokens/sec",
+            self.stats.embedded_tokens,
+            self.stats.embed_requests,
+            self.stats.embed_seconds,
+            self.stats.tokens_per_second,
+        )
+
+    def _upsert(self) -> None:
+        while True:
+            item = self._get(self._batches)
+            if item is _END_OF_STREAM:
+                return
+            if item.vectors:
+                upsert_vectors(self.index, item.vectors)
+                self.stats.vectors_upserted += len(item.vectors)
+                upserted_by_doc: Dict[str, List[str]] = {}
+                for vector in item.vectors:
+                    upserted_by_doc.setdefault(vector["metadata"]["doc_id"], []).append(vector["id"])
+                for doc_id, ids in upserted_by_doc.items():
+                    self.manifest.checkpoint(self._sources[doc_id], self.params, ids)
+            for done in item.completed:
+                stale = self.manifest.stale_ids(done.source, done.chunk_ids)
+                if stale:
+                    delete_vectors(self.index, stale)
+                    self.stats.vectors_deleted += len(stale)
+                self.manifest.record(
+                    done.source,
+                    self.params,
+                    done.chunk_ids,
+                    signatures=done.signatures,
+                    aliases=done.aliases,
+                )
+                self.manifest.ref_updates.update(done.aliases.values())
+                if done.source.doc_id in self._copied_docs:
+                    self.manifest.ref_updates.update(done.chunk_ids)
+            self.manifest.save()
+
+
+def _update_metadata(index, limiter: RateLimiter, chunk_id: str, metadata: Dict[str, object]) -> None:
+    """One ``index.update`` under ``limiter``; a 429 pauses the limiter and is retried."""
+    for attempt in range(1, MAX_UPDATE_ATTEMPTS + 1):
+        limiter.acquire(0)
+        try:
+            index.update(id=chunk_id, set_metadata=metadata)
+            return
+        except Exception as exc:  # pylint: disable=broad-except
+            if getattr(exc, "status", None) != 429 or attempt == MAX_UPDATE_ATTEMPTS:
+                raise
+            LOGGER.info("Vector index rate limited on metadata updates (attempt %s)", attempt)
+            limiter.pause(min(60.0, 2.0 ** attempt))
+
+
+def apply_reference_updates(
+    index,
+    manifest: IngestManifest,
+    limiter: Optional[RateLimiter] = None,
+) -> int:
+    """
+    Write duplicate-source metadata onto canonical vectors queued in the manifest.
+
+    Runs after the pipeline so every document folded into a chunk this run is
+    already recorded. Updates are one request per vector, so they go through a
+    rate limiter; the queue is saved as it drains and failed updates stay
+    queued, so an interrupted or partly failed run catches up on the next one.
+    Returns the number of vectors updated.
+    """
+    if not manifest.ref_updates:
+        return 0
+    limiter = limiter or RateLimiter(DEFAULT_INDEX_UPDATES_PER_MINUTE, 1)
+    refs = manifest.duplicate_refs()
+    targets = sorted(manifest.ref_updates & manifest.owned_ids())
+    # Queued ids whose vectors no longer exist need no update.
+    manifest.ref_updates.intersection_update(targets)
+    updated = failed = 0
+    for position, chunk_id in enumerate(targets, start=1):
+        try:
+            _update_metadata(index, limiter, chunk_id, duplicate_metadata(refs.get(chunk_id, [])))
+        except Exception as exc:  # pylint: disable=broad-except
+            failed += 1
+            LOGGER.warning("Duplicate-source metadata update failed for %s: %s", chunk_id, exc)
+        else:
+            updated += 1
+            manifest.ref_updates.discard(chunk_id)
+        if position % REF_UPDATE_PROGRESS_EVERY == 0:
+            manifest.save()
+            LOGGER.info(
+                "Duplicate-source metadata: %s/%s vectors updated, %s failed",
+                updated,
+                len(targets),
+                failed,
+            )
+    manifest.save()
+    if failed:
+        LOGGER.warning(
+            "Updated duplicate-source metadata on %s vectors; %s failed and stay queued for the next run",
+            updated,
+            failed,
+        )
+    else:
+        LOGGER.info("Updated duplicate-source metadata on %s vectors", updated)
+    return updated
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Ingest publications corpus into Pinecone")
     parser.add_argument("--base-dir", default=".", help="Project base directory")
     parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
     parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP)
-    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_INPUTS,
+        help="Maximum chunks per embedding request",
+    )
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=DEFAULT_BATCH_TOKENS,
+        help="Initial token budget per embedding request; adapts to rate limits",
+    )
+    parser.add_argument("--embed-concurrency", type=int, default=DEFAULT_EMBED_CONCURRENCY)
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=int(os.getenv("OPENAI_EMBEDDING_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+        help="Embedding requests per minute allowed by the account",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        default=int(os.getenv("OPENAI_EMBEDDING_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+        help="Embedding tokens per minute allowed by the account",
+    )
+    parser.add_argument(
+        "--update-rpm",
+        type=int,
+        default=int(os.getenv("PINECONE_UPDATE_RPM", DEFAULT_INDEX_UPDATES_PER_MINUTE)),
+        help="Vector metadata updates per minute when writing duplicate references",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="PDF extraction processes (default: CPU count)")
+    parser.add_argument(
+        "--extract-timeout",
+        type=float,
+        default=DEFAULT_EXTRACT_TIMEOUT,
+        help="Seconds allowed per document before extraction is abandoned",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=DEFAULT_INGEST_MANIFEST,
+        help="Ingest manifest path, relative to the base directory",
+    )
+    parser.add_argument(
+        "--duplicate-threshold",
+        type=float,
+        default=DEFAULT_DUPLICATE_THRESHOLD,
+        help="Estimated Jaccard similarity above which a chunk is folded into an earlier one",
+    )
+    parser.add_argument("--no-dedupe", action="store_true", help="Embed near-duplicate chunks separately")
+    parser.add_argument("--full", action="store_true", help="Ignore the ingest manifest and re-ingest everything")
     parser.add_argument("--dry-run", action="store_true")
     args = parser.parse_args()
 
@@ -199,20 +1332,52 @@ def main() -> None:
     pinecone_index = os.getenv("PINECONE_INDEX_NAME")
     embedding_model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
 
-    documents = collect_documents(
-        base_dir=Path(args.base_dir),
-        max_tokens=args.max_tokens,
-        overlap_tokens=args.overlap,
+    base_dir = Path(args.base_dir)
+    manifest = IngestManifest.load(base_dir / args.manifest)
+    params = ingest_params(args.max_tokens, args.overlap, embedding_model)
+
+    sources = list_sources(base_dir)
+    pending, removed_doc_ids = plan_ingest(sources, manifest, params, full=args.full)
+    copies = [source for source in pending if source.duplicate_of]
+    to_extract = [source for source in pending if not source.duplicate_of]
+    LOGGER.info(
+        "Corpus has %s documents: %s new or changed (%s exact copies), %s unchanged, %s removed",
+        len(sources),
+        len(pending),
+        len(copies),
+        len(sources) - len(pending),
+        len(removed_doc_ids),
     )
-    if not documents:
-        LOGGER.warning("No documents found to process")
+    if not pending and not removed_doc_ids and not manifest.ref_updates:
+        LOGGER.info("Corpus is up to date - nothing to ingest")
         return
 
-    encoding = tiktoken.get_encoding("cl100k_base")
-    tokens_per_doc = sum(len(encoding.encode(chunk.text)) for chunk in documents)
-    LOGGER.info("Total token count across chunks: %s", tokens_per_doc)
+    deduplicator: Optional[NearDuplicateIndex] = None
+    if not args.no_dedupe:
+        deduplicator = NearDuplicateIndex(threshold=args.duplicate_threshold)
+        manifest.seed(deduplicator, exclude={source.doc_id for source in pending} | set(removed_doc_ids))
 
     if args.dry_run:
+        stats = IngestStats()
+        for extracted in iter_extracted(to_extract, workers=args.workers, timeout=args.extract_timeout):
+            chunks = chunk_document(
+                extracted,
+                max_tokens=args.max_tokens,
+                overlap_tokens=args.overlap,
+                deduplicator=deduplicator,
+            )
+            stats.documents += 1
+            stats.chunks += len(chunks)
+            stats.duplicate_chunks += sum(1 for chunk in chunks if chunk.duplicate_of)
+            stats.tokens += sum(int(chunk.metadata["chunk_token_count"]) for chunk in chunks if not chunk.duplicate_of)
+        LOGGER.info(
+            "Prepared %s chunks from %s documents (%s near-duplicates and %s exact-copy documents skipped)",
+            stats.chunks - stats.duplicate_chunks,
+            stats.documents,
+            stats.duplicate_chunks,
+            len(copies),
+        )
+        LOGGER.info("Total token count across chunks to embed: %s", stats.tokens)
         LOGGER.info("Dry run complete - skipping embedding/upsert")
         return
 
@@ -223,14 +1388,58 @@ def main() -> None:
     pc = Pinecone(api_key=pinecone_api_key)
     index = pc.Index(pinecone_index)
 
-    vectors = embed_chunks(
+    # Vectors that carried a reference to a document being replaced or removed
+    # must be rewritten once the run settles.
+    for doc_id in [source.doc_id for source in pending] + removed_doc_ids:
+        manifest.ref_updates.update(manifest.referenced_ids(doc_id))
+
+    removed_ids: List[str] = []
+    for doc_id in removed_doc_ids + [source.doc_id for source in copies]:
+        if doc_id in manifest.documents:
+            removed_ids.extend(manifest.chunk_ids(doc_id))
+            removed_ids.extend(manifest.documents[doc_id].get("pending_delete", []))
+    delete_vectors(index, removed_ids)
+    for doc_id in removed_doc_ids:
+        manifest.remove(doc_id)
+    for source in copies:
+        manifest.record(source, params, [])
+        manifest.ref_updates.update(manifest.referenced_ids(source.doc_id))
+    manifest.save()
+
+    pipeline = IngestPipeline(
+        manifest=manifest,
+        params=params,
+        index=index,
         client=openai_client,
-        model=embedding_model,
-        chunks=documents,
+        embedding_model=embedding_model,
+        max_tokens=args.max_tokens,
+        overlap_tokens=args.overlap,
         batch_size=args.batch_size,
+        batch_tokens=args.batch_tokens,
+        embed_concurrency=args.embed_concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        extract_workers=args.workers,
+        extract_timeout=args.extract_timeout,
+        deduplicator=deduplicator,
+    )
+    stats = pipeline.run(to_extract)
+    apply_reference_updates(index, manifest, limiter=RateLimiter(args.update_rpm, 1))
+    LOGGER.info(
+        "Ingestion complete. Documents: %s (+%s exact copies), chunks: %s (%s tokens), "
+        "near-duplicates folded: %s, resumed from checkpoint: %s, "
+        "embedding: %s requests at %.0f tokens/sec, vectors upserted: %s, deleted: %s",
+        stats.documents,
+        len(copies),
+        stats.chunks,
+        stats.tokens,
+        stats.duplicate_chunks,
+        stats.resumed_chunks,
+        stats.embed_requests,
+        stats.tokens_per_second,
+        stats.vectors_upserted,
+        stats.vectors_deleted + len(removed_ids),
     )
-    upsert_vectors(index, vectors)
-    LOGGER.info("Ingestion complete. Total vectors upserted: %s", len(vectors))
 
 
 if __name__ == "__main__":
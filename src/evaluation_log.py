@@ -3,13 +3,17 @@ Evaluation logging and caching utilities.
 """
 from __future__ import annotations
 
+import atexit
+import logging
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
+LOGGER = logging.getLogger(__name__)
 
 ISO_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+DEFAULT_FLUSH_SIZE = 200
 
 
 def _normalize_iso(value: Optional[str]) -> Optional[str]:
@@ -23,23 +27,52 @@ def _normalize_iso(value: Optional[str]) -> Optional[str]:
     return value
 
 
+def _parse_evaluated(value: Optional[str]) -> Optional[datetime]:
+    normalized = _normalize_iso(value)
+    if not normalized:
+        return None
+    try:
+        return datetime.fromisoformat(normalized)
+    except ValueError:
+        return None
+
+
+class EvaluationState(NamedTuple):
+    last_evaluated: Optional[datetime]
+    last_updated: Optional[str]
+    status: Optional[str]
+
+
 class EvaluationLogger:
     """
     Lightweight SQLite-backed log to avoid re-evaluating notices unnecessarily.
+
+    The log is read into memory once, so ``should_skip`` does no I/O. ``record``
+    updates that state and buffers the row; buffered rows are written in one
+    transaction every ``flush_size`` records and on ``close()``, which is also
+    registered to run at interpreter exit.
     """
 
-    def __init__(self, db_path: str, skip_days: int = 0) -> None:
+    def __init__(self, db_path: str, skip_days: int = 0, flush_size: int = DEFAULT_FLUSH_SIZE) -> None:
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.skip_days = skip_days
+        self.flush_size = flush_size
+        self._pending: List[Tuple] = []
+        self._conn: Optional[sqlite3.Connection] = self._connect()
         self._init()
+        self._state: Dict[str, EvaluationState] = self._load()
+        atexit.register(self.close)
 
     def _connect(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
 
     def _init(self) -> None:
-        with self._connect() as conn:
-            conn.execute(
+        with self._conn:
+            self._conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS evaluations (
                     notice_id TEXT PRIMARY KEY,
@@ -51,29 +84,33 @@ class EvaluationLogger:
                 )
                 """
             )
-            conn.commit()
+
+    def _load(self) -> Dict[str, EvaluationState]:
+        rows = self._conn.execute("SELECT notice_id, last_evaluated, last_updated, status FROM evaluations")
+        return {
+            notice_id: EvaluationState(_parse_evaluated(last_evaluated), last_updated, status)
+            for notice_id, last_evaluated, last_updated, status in rows
+        }
+
+    def __enter__(self) -> "EvaluationLogger":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def state(self, notice_id: str) -> Optional[EvaluationState]:
+        return self._state.get(notice_id)
 
     def should_skip(self, notice_id: str, last_updated: Optional[str]) -> bool:
         if not self.skip_days:
             return False
-        normalized_updated = _normalize_iso(last_updated)
-        with self._connect() as conn:
-            row = conn.execute(
-                "SELECT last_evaluated, last_updated FROM evaluations WHERE notice_id = ?",
-                (notice_id,),
-            ).fetchone()
-        if not row:
+        state = self._state.get(notice_id)
+        if state is None or state.last_evaluated is None:
             return False
-        last_evaluated_iso, stored_updated = row
-        try:
-            last_evaluated = datetime.fromisoformat(last_evaluated_iso)
-        except ValueError:
-            return False
-        if normalized_updated and stored_updated and normalized_updated != stored_updated:
+        normalized_updated = _normalize_iso(last_updated)
+        if normalized_updated and state.last_updated and normalized_updated != state.last_updated:
             return False
-        if datetime.utcnow() - last_evaluated < timedelta(days=self.skip_days):
-            return True
-        return False
+        return datetime.now(timezone.utc) - state.last_evaluated < timedelta(days=self.skip_days)
 
     def record(
         self,
@@ -83,10 +120,28 @@ class EvaluationLogger:
         semantic_score: Optional[float],
         last_updated: Optional[str],
     ) -> None:
-        now_iso = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+        now = datetime.now(timezone.utc).replace(microsecond=0)
         normalized_updated = _normalize_iso(last_updated)
-        with self._connect() as conn:
-            conn.execute(
+        self._state[notice_id] = EvaluationState(now, normalized_updated, status)
+        self._pending.append(
+            (
+                notice_id,
+                now.replace(tzinfo=None).isoformat() + "Z",
+                normalized_updated,
+                status,
+                float(score) if score is not None else None,
+                float(semantic_score) if semantic_score is not None else None,
+            )
+        )
+        if len(self._pending) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered records in a single transaction and return how many were written."""
+        if not self._pending or self._conn is None:
+            return 0
+        with self._conn:
+            self._conn.executemany(
                 """
                 INSERT INTO evaluations (notice_id, last_evaluated, last_updated, status, score, semantic_score)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -97,15 +152,19 @@ class EvaluationLogger:
                     score = excluded.score,
                     semantic_score = excluded.semantic_score
                 """,
-                (
-                    notice_id,
-                    now_iso,
-                    normalized_updated,
-                    status,
-                    float(score) if score is not None else None,
-                    float(semantic_score) if semantic_score is not None else None,
-                ),
+                self._pending,
             )
-            conn.commit()
-
+        written = len(self._pending)
+        self._pending = []
+        LOGGER.debug("Flushed %d evaluation records to %s", written, self.db_path)
+        return written
 
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+            self._conn = None
+            atexit.unregister(self.close)
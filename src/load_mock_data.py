@@ -10,8 +10,9 @@ from typing import Any, Dict
 
 from dotenv import load_dotenv
 
+from .api.packed import DEFAULT_PACKED_PATH, publish_packed_snapshot
 from .models import Notice
-from .repository import NoticeRepository
+from .repository import DEFAULT_UPSERT_BATCH_SIZE, NoticeRepository
 from .scoring import CompanyProfile, score_notice
 from .main import transform_notice, load_yaml
 
@@ -24,6 +25,12 @@ def parse_args():
     parser.add_argument("--input", default="data/sample_notices.json")
     parser.add_argument("--config", default="config/company_profile.yaml")
     parser.add_argument("--db", default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_UPSERT_BATCH_SIZE)
+    parser.add_argument(
+        "--packed-snapshot",
+        default=os.getenv("NOTICES_SNAPSHOT_PATH", DEFAULT_PACKED_PATH),
+        help="Packed notices snapshot republished for the API workers",
+    )
     return parser.parse_args()
 
 
@@ -44,14 +51,27 @@ def main() -> None:
     Path(args.input).parent.mkdir(parents=True, exist_ok=True)
     data = load_json(args.input)
 
-    count = 0
-    for raw in data:
-        notice_model = transform_notice(raw)
-        notice_model.raw_json = raw
-        notice_model.fit_score = score_notice(raw, profile)
-        repo.upsert_notice(notice_model)
-        count += 1
-    LOGGER.info("Loaded %d mock notices into %s", count, db_url)
+    def notices():
+        for raw in data:
+            notice_model = transform_notice(raw)
+            notice_model.raw_json = raw
+            notice_model.fit_score = score_notice(raw, profile)
+            yield notice_model
+
+    timings = repo.upsert_notices(notices(), batch_size=args.batch_size)
+    changed = sum(timing.changed for timing in timings)
+    if changed:
+        run_id = repo.record_run(changed=changed, unchanged=sum(timing.unchanged for timing in timings))
+        publish_packed_snapshot(repo, args.packed_snapshot, run_id=run_id)
+    LOGGER.info(
+        "Loaded %d mock notices into %s (%d changed, %d unchanged) in %d batches (%.2fs)",
+        sum(timing.notices for timing in timings),
+        db_url,
+        sum(timing.changed for timing in timings),
+        sum(timing.unchanged for timing in timings),
+        len(timings),
+        sum(timing.seconds for timing in timings),
+    )
 
 
 if __name__ == "__main__":
@@ -6,18 +6,30 @@ import logging
 import os
 from datetime import datetime
 from pathlib import Path
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
 import yaml
 from dotenv import load_dotenv
 
-from .api import UNGMClient
+from .api.packed import DEFAULT_PACKED_PATH, publish_packed_snapshot
+from .archive import archiver_from_config
 from .auth import OAuthClient, OAuthSettings
 from .models import Notice, NoticeCountry, NoticeDocument, NoticeUNSPSC
-from .outputs import export_csv, export_json, render_email_body, render_html_dashboard
-from .repository import NoticeRepository
-from .scoring import CompanyProfile, score_notice, should_filter
+from .outputs import (
+    export_csv,
+    export_digest,
+    export_json,
+    read_export_digest,
+    render_email_body,
+    render_html_dashboard,
+    write_export_digest,
+)
+from .repository import DEFAULT_UPSERT_BATCH_SIZE, NoticeRepository
+from .run_report import DEFAULT_RUN_REPORT_PATH, RunReport, write_run_report
+from .scoring import CompanyProfile, filter_reason, score_notice, should_filter
 from .semantic import SemanticMatcher
+from .ungm_client import UNGMClient
 from .config_loader import load_scoring_config
 from .evaluation_log import EvaluationLogger
 
@@ -37,6 +49,22 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--template-dir", default="templates")
     parser.add_argument("--print", action="store_true", help="Print top results to stdout")
     parser.add_argument("--semantic-top-k", type=int, default=None, help="Top K semantic matches to retrieve")
+    parser.add_argument(
+        "--db-batch-size",
+        type=int,
+        default=DEFAULT_UPSERT_BATCH_SIZE,
+        help="Notices written to the database per transaction",
+    )
+    parser.add_argument(
+        "--run-report",
+        default=os.getenv("PIPELINE_REPORT_PATH", DEFAULT_RUN_REPORT_PATH),
+        help="Where to write the run's counts and stage timings (exposed by the API's /metrics)",
+    )
+    parser.add_argument(
+        "--packed-snapshot",
+        default=os.getenv("NOTICES_SNAPSHOT_PATH", DEFAULT_PACKED_PATH),
+        help="Packed notices snapshot republished for the API workers",
+    )
     return parser.parse_args()
 
 
@@ -96,6 +124,63 @@ def transform_notice(raw: Dict[str, Any]) -> Notice:
     return notice
 
 
+@dataclass
+class FetchPlan:
+    """Search results that still need a detail fetch, and counts of those that don't."""
+
+    to_fetch: List[Dict[str, Any]] = field(default_factory=list)
+    duplicates: int = 0
+    skipped_recent: int = 0
+    filtered_summary: int = 0
+
+    @property
+    def avoided(self) -> int:
+        return self.duplicates + self.skipped_recent + self.filtered_summary
+
+
+def plan_fetches(
+    summaries: List[Dict[str, Any]],
+    profile: CompanyProfile,
+    evaluation_logger: Optional[EvaluationLogger] = None,
+) -> FetchPlan:
+    """
+    Decide which notices need ``get_notice`` using only the search summaries and
+    the evaluation log. Summaries failing the cheap rules are logged as
+    ``filtered_summary`` so unchanged ones are skipped outright on later runs.
+    """
+    plan = FetchPlan()
+    seen = set()
+    for summary in summaries:
+        notice_id = summary.get("id") or summary.get("noticeId")
+        if not notice_id:
+            continue
+        notice_id = str(notice_id)
+        if notice_id in seen:
+            plan.duplicates += 1
+            continue
+        seen.add(notice_id)
+        last_updated = summary.get("lastUpdatedDate") or summary.get("lastUpdated")
+        if evaluation_logger and evaluation_logger.should_skip(notice_id, last_updated):
+            LOGGER.debug("Skipping notice %s due to recent evaluation log", notice_id)
+            plan.skipped_recent += 1
+            continue
+        reason = filter_reason(summary, profile, partial=True)
+        if reason:
+            LOGGER.debug("Filtered notice %s from search summary (%s)", notice_id, reason)
+            plan.filtered_summary += 1
+            if evaluation_logger:
+                evaluation_logger.record(
+                    notice_id,
+                    status="filtered_summary",
+                    score=0,
+                    semantic_score=None,
+                    last_updated=last_updated,
+                )
+            continue
+        plan.to_fetch.append(summary)
+    return plan
+
+
 def build_fit_explanation(
     notice: Dict[str, Any],
     structured_score: float,
@@ -157,6 +242,8 @@ def _safe_number(value: Any):
 
 
 def main() -> None:
+    started_at = datetime.utcnow()
+    report = RunReport()
     load_dotenv()
     args = parse_args()
 
@@ -178,6 +265,9 @@ def main() -> None:
     )
     client = UNGMClient(base_url=creds["api_base"], oauth_client=oauth)
     repository = NoticeRepository(db_url)
+    # Notices the archiver would move out again are not stored, so a closed notice
+    # fetched on every run is not re-inserted and re-archived each time.
+    archiver = archiver_from_config(repository, scoring_config)
     semantic_enabled = scoring_config.get("cache", {}).get("enable_semantic", True)
     semantic_top_k = args.semantic_top_k or scoring_config.get("semantic", {}).get("top_k", 5)
     semantic_matcher = None
@@ -200,102 +290,173 @@ def main() -> None:
             skip_days=cache_cfg.get("skip_if_recent_days", 0),
         )
 
-    LOGGER.info("Fetching notices updated in last %s day(s)", args.days)
-    raw_results = client.search_notices(days=args.days)
+    try:
+        LOGGER.info("Fetching notices updated in last %s day(s)", args.days)
+        with report.stage("search"):
+            raw_results = client.search_notices(days=args.days)
+
+        plan = plan_fetches(raw_results, profile, evaluation_logger)
+        report.count("searched", len(raw_results))
+        report.count("skipped_recent", plan.skipped_recent)
+        report.count("filtered_summary", plan.filtered_summary)
+        LOGGER.info(
+            "Fetching details for %d of %d notices; %d fetches avoided "
+            "(%d recently evaluated, %d filtered from summary, %d duplicate results)",
+            len(plan.to_fetch),
+            len(raw_results),
+            plan.avoided,
+            plan.skipped_recent,
+            plan.filtered_summary,
+            plan.duplicates,
+        )
 
-    notices: List[Notice] = []
-    for summary in raw_results:
-        notice_id = summary.get("id") or summary.get("noticeId")
-        if not notice_id:
-            continue
-        summary_last_updated = summary.get("lastUpdatedDate") or summary.get("lastUpdated")
-        if evaluation_logger and evaluation_logger.should_skip(str(notice_id), summary_last_updated):
-            LOGGER.debug("Skipping notice %s due to recent evaluation log", notice_id)
-            continue
+        notices: List[Notice] = []
+        unsaved: List[Notice] = []
+        for summary in plan.to_fetch:
+            notice_id = summary.get("id") or summary.get("noticeId")
+            summary_last_updated = summary.get("lastUpdatedDate") or summary.get("lastUpdated")
+
+            with report.stage("fetch"):
+                detailed = client.get_notice(str(notice_id))
+            report.count("fetched")
+            if should_filter(detailed, profile):
+                report.count("filtered_rule")
+                if evaluation_logger:
+                    evaluation_logger.record(
+                        str(notice_id),
+                        status="filtered_rule",
+                        score=0,
+                        semantic_score=None,
+                        last_updated=detailed.get("lastUpdatedDate") or summary_last_updated,
+                    )
+                continue
+
+            structured_score = score_notice(detailed, profile, semantic_similarity=None)
+
+            semantic_matches = []
+            semantic_similarity = None
+            if semantic_matcher and structured_score >= scoring_config.get("structured", {}).get("min_score", 0):
+                try:
+                    with report.stage("semantic"):
+                        matches = semantic_matcher.match_notice(detailed)
+                    report.count("embedded")
+                    semantic_matches = [match.to_dict() for match in matches]
+                    if semantic_matches:
+                        semantic_similarity = semantic_matches[0]["score"]
+                except Exception as exc:  # pylint: disable=broad-except
+                    LOGGER.warning("Semantic retrieval failed for notice %s: %s", notice_id, exc)
+
+            if semantic_matches:
+                detailed["semanticMatches"] = semantic_matches
+            if semantic_similarity is not None:
+                detailed["semanticScore"] = semantic_similarity
+            detailed["structuredScore"] = structured_score
+
+            total_score = score_notice(detailed, profile, semantic_similarity=semantic_similarity)
+            detailed["totalScore"] = total_score
+
+            semantic_min_similarity = scoring_config.get("semantic", {}).get("min_similarity")
+            total_min_score = scoring_config.get("total", {}).get("min_score", 0)
+            structured_min_score = scoring_config.get("structured", {}).get("min_score", 0)
+            store_all = persistence_cfg.get("store_all_notices", True)
+
+            should_store = True
+            status = "stored"
+
+            if not store_all:
+                if structured_score < structured_min_score:
+                    status = "filtered_structured"
+                    should_store = False
+                elif semantic_min_similarity and semantic_similarity is not None and semantic_similarity < semantic_min_similarity:
+                    status = "filtered_semantic"
+                    should_store = False
+                elif total_score < total_min_score:
+                    status = "filtered_total"
+                    should_store = False
 
-        detailed = client.get_notice(str(notice_id))
-        if should_filter(detailed, profile):
             if evaluation_logger:
                 evaluation_logger.record(
                     str(notice_id),
-                    status="filtered_rule",
-                    score=0,
-                    semantic_score=None,
+                    status=status,
+                    score=total_score,
+                    semantic_score=semantic_similarity,
                     last_updated=detailed.get("lastUpdatedDate") or summary_last_updated,
                 )
-            continue
 
-        structured_score = score_notice(detailed, profile, semantic_similarity=None)
-
-        semantic_matches = []
-        semantic_similarity = None
-        if semantic_matcher and structured_score >= scoring_config.get("structured", {}).get("min_score", 0):
-            try:
-                matches = semantic_matcher.match_notice(detailed)
-                semantic_matches = [match.to_dict() for match in matches]
-                if semantic_matches:
-                    semantic_similarity = semantic_matches[0]["score"]
-            except Exception as exc:  # pylint: disable=broad-except
-                LOGGER.warning("Semantic retrieval failed for notice %s: %s", notice_id, exc)
-
-        if semantic_matches:
-            detailed["semanticMatches"] = semantic_matches
-        if semantic_similarity is not None:
-            detailed["semanticScore"] = semantic_similarity
-        detailed["structuredScore"] = structured_score
-
-        total_score = score_notice(detailed, profile, semantic_similarity=semantic_similarity)
-        detailed["totalScore"] = total_score
-
-        semantic_min_similarity = scoring_config.get("semantic", {}).get("min_similarity")
-        total_min_score = scoring_config.get("total", {}).get("min_score", 0)
-        structured_min_score = scoring_config.get("structured", {}).get("min_score", 0)
-        store_all = persistence_cfg.get("store_all_notices", True)
-
-        should_store = store_all
-        status = "stored"
-
-        if not store_all:
-            if structured_score < structured_min_score:
-                status = "filtered_structured"
-                should_store = False
-            elif semantic_min_similarity and semantic_similarity is not None and semantic_similarity < semantic_min_similarity:
-                status = "filtered_semantic"
-                should_store = False
-            elif total_score < total_min_score:
-                status = "filtered_total"
-                should_store = False
+            if not should_store:
+                report.count("filtered_threshold")
+                continue
 
-        if evaluation_logger:
-            evaluation_logger.record(
-                str(notice_id),
-                status=status,
-                score=total_score,
-                semantic_score=semantic_similarity,
-                last_updated=detailed.get("lastUpdatedDate") or summary_last_updated,
+            notice_model = transform_notice(detailed)
+            explanation = build_fit_explanation(
+                detailed,
+                structured_score=structured_score,
+                total_score=total_score,
+                semantic_matches=semantic_matches,
             )
+            detailed["fitExplanation"] = explanation
+            notice_model.fit_score = total_score
+            notice_model.raw_json["fitExplanation"] = explanation
+            if archiver is not None and archiver.is_archivable(notice_model):
+                report.count("skipped_archivable")
+                continue
+            notices.append(notice_model)
+            unsaved.append(notice_model)
+            if len(unsaved) >= args.db_batch_size:
+                with report.stage("store"):
+                    repository.upsert_notices(unsaved, batch_size=args.db_batch_size)
+                unsaved = []
+
+        with report.stage("store"):
+            repository.upsert_notices(unsaved, batch_size=args.db_batch_size)
+    finally:
+        if evaluation_logger:
+            evaluation_logger.close()
+    changed = sum(timing.changed for timing in repository.batch_timings)
+    unchanged = sum(timing.unchanged for timing in repository.batch_timings)
+    LOGGER.info(
+        "Stored notices: %d changed, %d unchanged in %d batches (%.2fs)",
+        changed,
+        unchanged,
+        len(repository.batch_timings),
+        sum(timing.seconds for timing in repository.batch_timings),
+    )
 
-        if not should_store:
-            continue
-
-        notice_model = transform_notice(detailed)
-        explanation = build_fit_explanation(
-            detailed,
-            structured_score=structured_score,
-            total_score=total_score,
-            semantic_matches=semantic_matches,
-        )
-        detailed["fitExplanation"] = explanation
-        notice_model.fit_score = total_score
-        notice_model.raw_json["fitExplanation"] = explanation
-        repository.upsert_notice(notice_model)
-        notices.append(notice_model)
+    archived = 0
+    if archiver is not None:
+        with report.stage("archive"):
+            archived = archiver.run().notices
+    # A run that changed nothing keeps the run id and snapshot file, so API workers
+    # keep their snapshot, indexes and encoded bodies instead of rebuilding them.
+    if changed or archived:
+        run_id = repository.record_run(started_at=started_at, changed=changed, unchanged=unchanged, archived=archived)
+        with report.stage("publish"):
+            publish_packed_snapshot(repository, args.packed_snapshot, run_id=run_id)
+    else:
+        LOGGER.info("No notices changed or archived - keeping the current pipeline run and packed snapshot")
 
-    notices.sort(key=lambda n: n.fit_score or 0, reverse=True)
+    notices.sort(key=lambda n: (-(n.fit_score or 0), n.id))
 
-    export_json(notices, args.export_json)
-    export_csv(notices, args.export_csv)
-    render_html_dashboard(notices, args.template_dir, args.export_html)
+    # Leaving the export files untouched keeps their mtime, so consumers keyed on it
+    # (the API snapshot, static hosting caches) are not invalidated by a no-op run.
+    digest = export_digest(notices)
+    digest_path = os.path.join(os.path.dirname(args.export_json), ".export_digest")
+    export_paths = (args.export_json, args.export_csv, args.export_html)
+    if read_export_digest(digest_path) == digest and all(os.path.exists(path) for path in export_paths):
+        LOGGER.info("Exports unchanged since last run - skipping JSON/CSV/HTML export")
+    else:
+        with report.stage("export"):
+            export_json(notices, args.export_json)
+            export_csv(notices, args.export_csv)
+            render_html_dashboard(notices, args.template_dir, args.export_html)
+            write_export_digest(digest_path, digest)
+
+    report.count("stored", len(notices))
+    report.count("changed", changed)
+    report.count("unchanged", unchanged)
+    report.count("archived", archived)
+    report.api_calls = client.request_count
+    write_run_report(report.finish(), args.run_report)
 
     LOGGER.info("Processed %d notices", len(notices))
     if args.print:
@@ -0,0 +1,170 @@
+"""Versioned schema migrations for the notices database, applied on repository start-up."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Column, DateTime, LargeBinary, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .compression import decode_json, encode_json, encode_vector, is_compressed
+
+LOGGER = logging.getLogger(__name__)
+
+Migration = Callable[[Operations, Connection], None]
+
+NOTICE_FTS_TABLE = "notices_fts"
+NOTICE_FTS_COLUMNS = ("title", "summary", "description", "agency")
+# Must match the GIN index expression exactly for Postgres to use the index.
+PG_SEARCH_DOCUMENT = (
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(summary, '') || ' ' || "
+    "coalesce(description, '') || ' ' || coalesce(agency, ''))"
+)
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("revision", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_index_if_missing(
+    operations: Operations,
+    connection: Connection,
+    name: str,
+    table: str,
+    columns: List[str],
+) -> None:
+    existing = {index["name"] for index in inspect(connection).get_indexes(table)}
+    if name not in existing:
+        operations.create_index(name, table, columns)
+
+
+def _secondary_indexes(operations: Operations, connection: Connection) -> None:
+    for table in ("notice_documents", "notice_unspsc", "notice_countries"):
+        _create_index_if_missing(operations, connection, f"ix_{table}_notice_id", table, ["notice_id"])
+    for column in ("deadline", "fit_score", "agency"):
+        _create_index_if_missing(operations, connection, f"ix_notices_{column}", "notices", [column])
+
+
+def _notice_content_hash(operations: Operations, connection: Connection) -> None:
+    existing = {column["name"] for column in inspect(connection).get_columns("notices")}
+    if "content_hash" not in existing:
+        operations.add_column("notices", Column("content_hash", String(64)))
+
+
+def _recompress(value, encode):
+    if value is None or (not isinstance(value, str) and is_compressed(value)):
+        return value
+    return encode(decode_json(value))
+
+
+def _compress_cold_columns(operations: Operations, connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        columns = {column["name"]: column["type"] for column in inspect(connection).get_columns("notices")}
+        for name in ("raw_json", "search_embedding"):
+            if not isinstance(columns[name], LargeBinary):
+                operations.alter_column(
+                    "notices",
+                    name,
+                    type_=LargeBinary,
+                    postgresql_using=f"convert_to({name}::text, 'UTF8')",
+                )
+
+    # Plain text() queries skip the column types, so legacy JSON text comes back as-is.
+    last_id = ""
+    rewritten = 0
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, raw_json, search_embedding FROM notices "
+                "WHERE id > :last_id ORDER BY id LIMIT 500"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for notice_id, raw_json, embedding in rows:
+            last_id = notice_id
+            new_raw_json = _recompress(raw_json, encode_json)
+            new_embedding = _recompress(embedding, encode_vector)
+            if new_raw_json is not raw_json or new_embedding is not embedding:
+                updates.append({"id": notice_id, "raw_json": new_raw_json, "embedding": new_embedding})
+        if updates:
+            connection.execute(
+                text("UPDATE notices SET raw_json = :raw_json, search_embedding = :embedding WHERE id = :id"),
+                updates,
+            )
+            rewritten += len(updates)
+    LOGGER.info("Compressed raw_json/search_embedding on %s notices", rewritten)
+
+
+def _notice_search_index(operations: Operations, connection: Connection) -> None:
+    if connection.dialect.name == "postgresql":
+        operations.execute(
+            text(f"CREATE INDEX IF NOT EXISTS ix_notices_search ON notices USING GIN ({PG_SEARCH_DOCUMENT})")
+        )
+        return
+    if connection.dialect.name != "sqlite":
+        return
+    columns = ", ".join(NOTICE_FTS_COLUMNS)
+    connection.execute(
+        text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {NOTICE_FTS_TABLE} "
+            f"USING fts5(notice_id UNINDEXED, {columns}, tokenize='porter unicode61')"
+        )
+    )
+    _rebuild_search_index(connection)
+
+
+def _rebuild_search_index(connection: Connection) -> None:
+    # Each FTS row shares its notice's rowid, so rows are replaced and deleted by rowid.
+    columns = ", ".join(NOTICE_FTS_COLUMNS)
+    connection.execute(text(f"DELETE FROM {NOTICE_FTS_TABLE}"))
+    connection.execute(
+        text(
+            f"INSERT INTO {NOTICE_FTS_TABLE} (rowid, notice_id, {columns}) "
+            f"SELECT rowid, id, {columns} FROM notices"
+        )
+    )
+
+
+def _notice_search_rowids(operations: Operations, connection: Connection) -> None:
+    if connection.dialect.name == "sqlite":
+        _rebuild_search_index(connection)
+
+
+# Append only. Every migration must be safe to run against a database that
+# create_all() has just built from the current models.
+MIGRATIONS: List[Tuple[str, Migration]] = [
+    ("0001_secondary_indexes", _secondary_indexes),
+    ("0002_notice_content_hash", _notice_content_hash),
+    ("0003_compress_cold_columns", _compress_cold_columns),
+    ("0004_notice_search_index", _notice_search_index),
+    ("0005_notice_search_rowids", _notice_search_rowids),
+]
+
+
+def upgrade(engine: Engine) -> List[str]:
+    """Apply pending migrations in order and return the revisions applied."""
+    applied: List[str] = []
+    with engine.begin() as connection:
+        _metadata.create_all(connection)
+        done = set(connection.execute(select(schema_migrations.c.revision)).scalars())
+        operations = Operations(MigrationContext.configure(connection))
+        for revision, migration in MIGRATIONS:
+            if revision in done:
+                continue
+            LOGGER.info("Applying schema migration %s", revision)
+            migration(operations, connection)
+            connection.execute(
+                schema_migrations.insert().values(revision=revision, applied_at=datetime.utcnow())
+            )
+            applied.append(revision)
+    return applied
@@ -0,0 +1,125 @@
+"""
+MinHash signatures and LSH banding for near-duplicate text detection.
+"""
+from __future__ import annotations
+
+import base64
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+_MASK_32 = np.uint64(0xFFFFFFFF)
+_SHIFT_32 = np.uint64(32)
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures over token shingles.
+
+    Each permutation is a multiply-shift hash (top 32 bits of ``a * x + b`` mod
+    2**64) of the 32-bit shingle hash, so a whole chunk is hashed with a couple of
+    vectorised NumPy operations.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 1 << 64, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 64, size=(num_perm, 1), dtype=np.uint64)
+        self._mix = rng.integers(1, 1 << 63, size=shingle_size, dtype=np.uint64) | np.uint64(1)
+
+    def _shingle_hashes(self, tokens: Sequence[int]) -> np.ndarray:
+        values = np.asarray(tokens, dtype=np.uint64)
+        width = min(self.shingle_size, len(values))
+        count = len(values) - width + 1
+        combined = np.zeros(count, dtype=np.uint64)
+        for offset in range(width):
+            combined += values[offset : offset + count] * self._mix[offset]
+        return np.unique((combined ^ (combined >> _SHIFT_32)) & _MASK_32)
+
+    def signature(self, tokens: Sequence[int]) -> np.ndarray:
+        if len(tokens) == 0:
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        shingles = self._shingle_hashes(tokens)
+        permuted = ((self._a * shingles + self._b) >> _SHIFT_32) & _MASK_32
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+class LSHIndex:
+    """Band-hash index returning keys whose signatures collide in at least one band."""
+
+    def __init__(self, num_perm: int = 128, bands: int = 16) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._tables: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def insert(self, key: str, signature: np.ndarray) -> None:
+        for table, band_key in zip(self._tables, self._band_keys(signature)):
+            table[band_key].append(key)
+
+    def candidates(self, signature: np.ndarray) -> Set[str]:
+        found: Set[str] = set()
+        for table, band_key in zip(self._tables, self._band_keys(signature)):
+            found.update(table.get(band_key, ()))
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    Remembers the signature of every distinct chunk seen so far.
+
+    ``find`` returns the key of an earlier chunk whose estimated Jaccard
+    similarity is at least ``threshold``; LSH narrows the comparison to a handful
+    of candidates, so lookups stay cheap as the corpus grows.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+    ) -> None:
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self._lsh = LSHIndex(num_perm=num_perm, bands=bands)
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, tokens: Sequence[int]) -> np.ndarray:
+        return self.hasher.signature(tokens)
+
+    def find(self, signature: np.ndarray) -> Optional[str]:
+        best_key: Optional[str] = None
+        best_score = -1.0
+        for key in sorted(self._lsh.candidates(signature)):
+            score = float(np.mean(self._signatures[key] == signature))
+            if score >= self.threshold and score > best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def add(self, key: str, signature: np.ndarray) -> None:
+        if key in self._signatures:
+            return
+        self._signatures[key] = signature
+        self._lsh.insert(key, signature)
+
+
+def encode_signature(signature: np.ndarray) -> str:
+    return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+
+def decode_signature(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype="<u4").astype(np.uint32)
@@ -12,10 +12,11 @@ from sqlalchemy import (
     Numeric,
     String,
     Text,
-    JSON,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
+from .compression import CompressedJSON, CompressedVector
+
 Base = declarative_base()
 
 
@@ -28,16 +29,17 @@ class Notice(Base):
     description = Column(Text)
     procurement_category = Column(String(50))
     procurement_type = Column(String(50))
-    agency = Column(String(120))
-    deadline = Column(Date)
+    agency = Column(String(120), index=True)
+    deadline = Column(Date, index=True)
     publish_date = Column(DateTime)
     status = Column(String(50))
     budget_min = Column(Numeric)
     budget_max = Column(Numeric)
     currency = Column(String(10))
-    raw_json = Column(JSON)
-    fit_score = Column(Integer)
-    search_embedding = Column(JSON)
+    raw_json = Column(CompressedJSON)
+    fit_score = Column(Integer, index=True)
+    search_embedding = Column(CompressedVector)
+    content_hash = Column(String(64))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -50,7 +52,7 @@ class NoticeDocument(Base):
     __tablename__ = "notice_documents"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    notice_id = Column(String, ForeignKey("notices.id", ondelete="CASCADE"))
+    notice_id = Column(String, ForeignKey("notices.id", ondelete="CASCADE"), index=True)
     url = Column(Text)
     name = Column(Text)
     type = Column(String(50))
@@ -60,7 +62,7 @@ class NoticeUNSPSC(Base):
     __tablename__ = "notice_unspsc"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    notice_id = Column(String, ForeignKey("notices.id", ondelete="CASCADE"))
+    notice_id = Column(String, ForeignKey("notices.id", ondelete="CASCADE"), index=True)
     code = Column(String(20))
     description = Column(Text)
 
@@ -69,6 +71,19 @@ class NoticeCountry(Base):
     __tablename__ = "notice_countries"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    notice_id = Column(String, ForeignKey("notices.id", ondelete="CASCADE"))
+    notice_id = Column(String, ForeignKey("notices.id", ondelete="CASCADE"), index=True)
     country_code = Column(String(10))
     country_name = Column(String(120))
+
+
+class PipelineRun(Base):
+    """One committed pipeline run; readers compare the latest id to notice new data."""
+
+    __tablename__ = "pipeline_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+    notices_changed = Column(Integer, default=0)
+    notices_unchanged = Column(Integer, default=0)
+    notices_archived = Column(Integer, default=0)
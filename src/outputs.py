@@ -2,16 +2,39 @@
 from __future__ import annotations
 
 import csv
+import hashlib
 import json
 import os
 from datetime import datetime
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 from jinja2 import Environment, FileSystemLoader, TemplateNotFound
 
 from .models import Notice
 
 
+def export_digest(notices: Iterable[Notice]) -> str:
+    """Digest of the ordered (id, content_hash) pairs an export would contain."""
+    digest = hashlib.sha256()
+    for notice in notices:
+        digest.update(f"{notice.id}:{notice.content_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def read_export_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return handle.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_export_digest(path: str, digest: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(digest)
+
+
 def export_json(notices: Iterable[Notice], path: str) -> None:
     data = [notice.raw_json for notice in notices]
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -1,22 +1,314 @@
 """Persistence helpers for notice ingestion."""
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
 from contextlib import contextmanager
-from typing import Iterable, List
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from sqlalchemy import create_engine
+from sqlalchemy import (
+    Table,
+    and_,
+    bindparam,
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_upsert
 from sqlalchemy.dialects.sqlite import insert as sqlite_upsert
+from sqlalchemy.engine import URL, Connection, Engine, make_url
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session, defer, selectinload, sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.expression import ColumnClause, TableClause
 
-from .models import Base, Notice, NoticeCountry, NoticeDocument, NoticeUNSPSC
+from .migrations import NOTICE_FTS_COLUMNS, NOTICE_FTS_TABLE, PG_SEARCH_DOCUMENT, upgrade
+from .models import Base, Notice, NoticeCountry, NoticeDocument, NoticeUNSPSC, PipelineRun
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_UPSERT_BATCH_SIZE = 500
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_SEARCH_LIMIT = 20
+SNIPPET_TOKENS = 16
+# bm25 weights for notice_id (unindexed), title, summary, description, agency.
+FTS_COLUMN_WEIGHTS = (0.0, 10.0, 4.0, 1.0, 2.0)
+FTS_TABLE = TableClause(NOTICE_FTS_TABLE, ColumnClause("rowid"), ColumnClause("notice_id"))
+SQLITE_BUSY_TIMEOUT_MS = 30_000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+
+UPSERT_BUILDERS = {
+    "sqlite": sqlite_upsert,
+    "postgresql": postgresql_upsert,
+}
+
+NOTICE_COLUMNS = [column.name for column in Notice.__table__.columns]
+# Bookkeeping columns that do not describe the notice itself.
+UNHASHED_COLUMNS = {"created_at", "updated_at", "content_hash"}
+CHILD_TABLES = (
+    ("documents", NoticeDocument.__table__),
+    ("unspsc", NoticeUNSPSC.__table__),
+    ("countries", NoticeCountry.__table__),
+)
+
+
+@dataclass
+class UpsertBatchTiming:
+    batch: int
+    notices: int
+    unchanged: int
+    child_rows_inserted: int
+    child_rows_deleted: int
+    seconds: float
+
+    @property
+    def changed(self) -> int:
+        return self.notices - self.unchanged
+
+    @property
+    def notices_per_second(self) -> float:
+        return self.notices / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class NoticeFilters:
+    deadline_from: Optional[date] = None
+    deadline_to: Optional[date] = None
+    agency: Optional[str] = None
+    country: Optional[str] = None
+    min_score: Optional[int] = None
+
+    def clauses(self) -> List:
+        clauses = []
+        if self.deadline_from is not None:
+            clauses.append(Notice.deadline >= self.deadline_from)
+        if self.deadline_to is not None:
+            clauses.append(Notice.deadline <= self.deadline_to)
+        if self.agency is not None:
+            clauses.append(Notice.agency == self.agency)
+        if self.country is not None:
+            clauses.append(Notice.countries.any(NoticeCountry.country_code == self.country))
+        if self.min_score is not None:
+            clauses.append(Notice.fit_score >= self.min_score)
+        return clauses
+
+
+@dataclass
+class SearchHit:
+    notice_id: str
+    title: Optional[str]
+    agency: Optional[str]
+    deadline: Optional[date]
+    fit_score: Optional[int]
+    score: float
+    snippet: str
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "id": self.notice_id,
+            "title": self.title,
+            "agency": self.agency,
+            "deadline": self.deadline.isoformat() if self.deadline else None,
+            "fitScore": self.fit_score,
+            "score": self.score,
+            "snippet": self.snippet,
+        }
+
+
+def fts5_query(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word required, the last one as a prefix."""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def notice_content_hash(notice: Notice) -> str:
+    """SHA-256 of the notice's columns (score included) and its child rows, in a stable order."""
+    payload = {name: getattr(notice, name) for name in NOTICE_COLUMNS if name not in UNHASHED_COLUMNS}
+    for attribute, table in CHILD_TABLES:
+        value_columns = [column.name for column in table.columns if column.name not in ("id", "notice_id")]
+        payload[attribute] = sorted(
+            [[getattr(child, name) for name in value_columns] for child in getattr(notice, attribute)],
+            key=lambda values: json.dumps(values, default=str),
+        )
+    encoded = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _read_only_url(db_url: str) -> URL:
+    """``db_url`` opened read-only: SQLite in ``mode=ro`` (a missing file is an error, not created)."""
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        return url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"})
+    return url
+
+
+def _engine_options(
+    db_url: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    max_overflow: int = DEFAULT_MAX_OVERFLOW,
+    read_only: bool = False,
+) -> Dict[str, object]:
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        options: Dict[str, object] = {
+            "connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        }
+        if url.database in (None, "", ":memory:"):
+            # Every connection to an in-memory database is a separate database.
+            options["poolclass"] = StaticPool
+        else:
+            options.update(pool_size=pool_size, max_overflow=max_overflow)
+        return options
+    if backend == "postgresql":
+        options = {"pool_size": pool_size, "max_overflow": max_overflow, "pool_pre_ping": True, "pool_recycle": 1800}
+        if read_only:
+            options["connect_args"] = {"options": "-c default_transaction_read_only=on"}
+        if url.get_driver_name() == "psycopg2":
+            # Batch the child-row executemany calls instead of one round trip per row.
+            options["executemany_mode"] = "values_plus_batch"
+        return options
+    return {}
+
+
+def _configure_sqlite(engine: Engine, read_only: bool = False) -> None:
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record) -> None:
+        cursor = dbapi_connection.cursor()
+        # WAL lets the API read while the pipeline writes; NORMAL sync is safe under WAL.
+        # The mode is stored in the file, so read-only connections leave it to the writer.
+        if not in_memory and not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+
+def delete_search_rows(connection: Union[Connection, Session], ids: List[str]) -> None:
+    """
+    Drop the notices' FTS rows. They share the notice's rowid, so this is a rowid
+    lookup; ``notice_id`` is UNINDEXED and filtering on it scans the whole index.
+    Must run before the notices themselves are deleted.
+    """
+    connection.execute(
+        text(
+            f"DELETE FROM {NOTICE_FTS_TABLE} WHERE rowid IN (SELECT rowid FROM notices WHERE id IN :ids)"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    )
+
+
+def _sync_search_index(session: Session, notices: List[Notice]) -> None:
+    columns = ", ".join(NOTICE_FTS_COLUMNS)
+    ids = [notice.id for notice in notices]
+    delete_search_rows(session, ids)
+    session.execute(
+        text(
+            f"INSERT INTO {NOTICE_FTS_TABLE} (rowid, notice_id, {columns}) "
+            f"SELECT rowid, id, {columns} FROM notices WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    )
+
+
+def _sync_children(session: Session, table: Table, attribute: str, notices: List[Notice]) -> Tuple[int, int]:
+    """Make ``table`` hold exactly the notices' current children; returns (inserted, deleted)."""
+    value_columns = [column.name for column in table.columns if column.name not in ("id", "notice_id")]
+    wanted: Dict[str, Counter] = {
+        notice.id: Counter(
+            tuple(getattr(child, name) for name in value_columns) for child in getattr(notice, attribute)
+        )
+        for notice in notices
+    }
+
+    stale_ids: List[int] = []
+    existing = session.execute(
+        select(table.c.id, table.c.notice_id, *(table.c[name] for name in value_columns)).where(
+            table.c.notice_id.in_(list(wanted))
+        )
+    )
+    for row_id, notice_id, *values in existing:
+        remaining = wanted[notice_id]
+        key = tuple(values)
+        if remaining[key] > 0:
+            remaining[key] -= 1
+        else:
+            stale_ids.append(row_id)
+
+    if stale_ids:
+        session.execute(delete(table).where(table.c.id.in_(stale_ids)))
+    rows = [
+        {"notice_id": notice_id, **dict(zip(value_columns, key))}
+        for notice_id, remaining in wanted.items()
+        for key, count in remaining.items()
+        for _ in range(count)
+    ]
+    if rows:
+        session.execute(insert(table), rows)
+    return len(rows), len(stale_ids)
+
+
+def create_notice_engine(
+    db_url: str,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    max_overflow: int = DEFAULT_MAX_OVERFLOW,
+    read_only: bool = False,
+) -> Engine:
+    """Engine with the per-backend pool settings and SQLite PRAGMAs used for notice data."""
+    url = _read_only_url(db_url) if read_only else db_url
+    engine = create_engine(
+        url, echo=False, future=True, **_engine_options(db_url, pool_size, max_overflow, read_only)
+    )
+    if engine.dialect.name not in UPSERT_BUILDERS:
+        raise ValueError(f"Unsupported database dialect for notice upserts: {engine.dialect.name}")
+    if engine.dialect.name == "sqlite":
+        _configure_sqlite(engine, read_only)
+    return engine
 
 
 class NoticeRepository:
-    def __init__(self, db_url: str):
-        self.engine = create_engine(db_url, echo=False, future=True)
-        Base.metadata.create_all(self.engine)
+    """
+    Reads and writes notices. Writers create the schema and apply pending
+    migrations on construction; a ``read_only`` repository (the API) does neither
+    and opens the database read-only, so it never creates, migrates or writes it.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_overflow: int = DEFAULT_MAX_OVERFLOW,
+        read_only: bool = False,
+    ):
+        self.engine = create_notice_engine(db_url, pool_size, max_overflow, read_only)
+        self.dialect = self.engine.dialect.name
+        self.read_only = read_only
+        if not read_only:
+            Base.metadata.create_all(self.engine)
+            upgrade(self.engine)
         self.Session = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
+        self.batch_timings: List[UpsertBatchTiming] = []
 
     @contextmanager
     def session_scope(self) -> Iterable[Session]:
@@ -31,30 +323,276 @@ class NoticeRepository:
             session.close()
 
     def upsert_notice(self, notice: Notice) -> None:
-        with self.session_scope() as session:
-            data = {
-                column.name: getattr(notice, column.name)
-                for column in Notice.__table__.columns
-            }
-            stmt = sqlite_upsert(Notice).values(**data)
-            stmt = stmt.on_conflict_do_update(
-                index_elements=[Notice.id],
-                set_={
-                    column.name: getattr(notice, column.name)
-                    for column in Notice.__table__.columns
-                    if column.name != "id"
-                },
+        self.upsert_notices([notice])
+
+    def upsert_notices(
+        self,
+        notices: Iterable[Notice],
+        batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+    ) -> List[UpsertBatchTiming]:
+        """
+        Insert or update notices and sync their child rows, ``batch_size`` at a time.
+
+        Every notice gets ``content_hash`` set; notices whose hash matches the stored
+        row are left untouched (no write, no ``updated_at`` bump). Each batch of
+        changed notices is one transaction: a multi-row ``INSERT ... ON CONFLICT`` for the
+        notices, then per child table one SELECT of the existing rows and only the
+        DELETEs and INSERTs needed to match the notices' current children. Returns
+        the timing of every batch written by this call; the same records accumulate
+        on ``batch_timings``.
+        """
+        timings: List[UpsertBatchTiming] = []
+        batch: Dict[str, Notice] = {}
+        for notice in notices:
+            # A later copy of the same notice in a batch wins, as it would with per-row upserts.
+            batch.pop(notice.id, None)
+            batch[notice.id] = notice
+            if len(batch) >= batch_size:
+                timings.append(self._upsert_batch(list(batch.values())))
+                batch = {}
+        if batch:
+            timings.append(self._upsert_batch(list(batch.values())))
+        return timings
+
+    def _upsert_batch(self, notices: List[Notice]) -> UpsertBatchTiming:
+        started = time.perf_counter()
+        for notice in notices:
+            notice.content_hash = notice_content_hash(notice)
+        seen = len(notices)
+        with self.engine.connect() as connection:
+            stored = dict(
+                connection.execute(
+                    select(Notice.__table__.c.id, Notice.__table__.c.content_hash).where(
+                        Notice.__table__.c.id.in_([notice.id for notice in notices])
+                    )
+                ).all()
             )
+        notices = [notice for notice in notices if stored.get(notice.id) != notice.content_hash]
+        if not notices:
+            return self._record_timing(seen, seen, 0, 0, started)
+
+        now = datetime.utcnow()
+        rows = []
+        for notice in notices:
+            row = {name: getattr(notice, name) for name in NOTICE_COLUMNS}
+            row["created_at"] = row["created_at"] or now
+            row["updated_at"] = now
+            rows.append(row)
+
+        stmt = UPSERT_BUILDERS[self.dialect](Notice.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Notice.__table__.c.id],
+            set_={name: stmt.excluded[name] for name in NOTICE_COLUMNS if name not in ("id", "created_at")},
+        )
+
+        inserted = deleted = 0
+        with self.session_scope() as session:
             session.execute(stmt)
+            for attribute, table in CHILD_TABLES:
+                added, removed = _sync_children(session, table, attribute, notices)
+                inserted += added
+                deleted += removed
+            if self.dialect == "sqlite":
+                _sync_search_index(session, notices)
+
+        return self._record_timing(seen, seen - len(notices), inserted, deleted, started)
+
+    def _record_timing(
+        self,
+        notices: int,
+        unchanged: int,
+        inserted: int,
+        deleted: int,
+        started: float,
+    ) -> UpsertBatchTiming:
+        timing = UpsertBatchTiming(
+            batch=len(self.batch_timings),
+            notices=notices,
+            unchanged=unchanged,
+            child_rows_inserted=inserted,
+            child_rows_deleted=deleted,
+            seconds=time.perf_counter() - started,
+        )
+        self.batch_timings.append(timing)
+        LOGGER.info(
+            "Upserted batch %s: %s notices (%s unchanged), child rows +%s/-%s in %.3fs (%.0f notices/sec)",
+            timing.batch,
+            timing.notices,
+            timing.unchanged,
+            timing.child_rows_inserted,
+            timing.child_rows_deleted,
+            timing.seconds,
+            timing.notices_per_second,
+        )
+        return timing
+
+    def iter_notices(
+        self,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        deadline_from: Optional[date] = None,
+        deadline_to: Optional[date] = None,
+        agency: Optional[str] = None,
+        country: Optional[str] = None,
+        min_score: Optional[int] = None,
+        include_raw_json: bool = False,
+        include_embedding: bool = False,
+    ) -> Iterator[Notice]:
+        """
+        Stream notices ordered by fit_score (descending, unscored last) then id.
+
+        Pages are fetched by keyset on ``(fit_score, id)`` with a short-lived session
+        each, rows are streamed with ``yield_per`` and documents/UNSPSC/countries are
+        eager-loaded with SELECT IN, so the yielded (detached) notices can be read
+        freely. ``raw_json`` and ``search_embedding`` are deferred unless requested;
+        touching a deferred column on a yielded notice raises. ``country`` matches
+        a country code.
+        """
+        filters = NoticeFilters(
+            deadline_from=deadline_from,
+            deadline_to=deadline_to,
+            agency=agency,
+            country=country,
+            min_score=min_score,
+        ).clauses()
+
+        options = [selectinload(Notice.documents), selectinload(Notice.unspsc), selectinload(Notice.countries)]
+        if not include_raw_json:
+            options.append(defer(Notice.raw_json, raiseload=True))
+        if not include_embedding:
+            options.append(defer(Notice.search_embedding, raiseload=True))
 
-            session.query(NoticeDocument).filter_by(notice_id=notice.id).delete()
-            session.query(NoticeUNSPSC).filter_by(notice_id=notice.id).delete()
-            session.query(NoticeCountry).filter_by(notice_id=notice.id).delete()
+        # Scored notices first, then the unscored ones by id; NULL cannot take part
+        # in the (fit_score, id) keyset comparison.
+        phases = [
+            (Notice.fit_score.is_not(None), (Notice.fit_score.desc(), Notice.id)),
+            (Notice.fit_score.is_(None), (Notice.id,)),
+        ]
+        for phase_filter, order_by in phases:
+            last: Optional[Notice] = None
+            while True:
+                stmt = select(Notice).where(phase_filter, *filters).options(*options).order_by(*order_by)
+                if last is not None:
+                    if last.fit_score is None:
+                        stmt = stmt.where(Notice.id > last.id)
+                    else:
+                        stmt = stmt.where(
+                            or_(
+                                Notice.fit_score < last.fit_score,
+                                and_(Notice.fit_score == last.fit_score, Notice.id > last.id),
+                            )
+                        )
+                stmt = stmt.limit(page_size).execution_options(yield_per=page_size)
+                count = 0
+                with self.session_scope() as session:
+                    for notice in session.scalars(stmt):
+                        count += 1
+                        last = notice
+                        yield notice
+                if count < page_size:
+                    break
 
-            session.add_all(notice.documents)
-            session.add_all(notice.unspsc)
-            session.add_all(notice.countries)
+    def search(
+        self,
+        query: str,
+        filters: Optional[NoticeFilters] = None,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+    ) -> List[SearchHit]:
+        """
+        Full-text search over title, summary, description and agency.
+
+        SQLite uses the FTS5 index kept in sync by ``upsert_notices`` (BM25, title
+        weighted highest); Postgres uses a GIN-indexed tsvector with ``ts_rank``.
+        Higher ``score`` is a better match; snippets mark hits with ``<mark>``.
+        """
+        clauses = (filters or NoticeFilters()).clauses()
+        columns = (Notice.id, Notice.title, Notice.agency, Notice.deadline, Notice.fit_score)
+        if self.dialect == "sqlite":
+            match = fts5_query(query)
+            if match is None:
+                return []
+            # Rank first, then fetch columns and snippets for the top hits only:
+            # snippet() is far more expensive than bm25() and would otherwise run for
+            # every matching row.
+            match_clause = text(f"{NOTICE_FTS_TABLE} MATCH :match").bindparams(match=match)
+            weights = ", ".join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+            rank = literal_column(f"bm25({NOTICE_FTS_TABLE}, {weights})")
+            top = select(FTS_TABLE.c.rowid.label("fts_rowid"), rank.label("rank")).where(match_clause)
+            if clauses:
+                top = top.join_from(FTS_TABLE, Notice.__table__, Notice.id == FTS_TABLE.c.notice_id).where(*clauses)
+            top = top.order_by(rank).limit(limit).cte("top_hits")
+            stmt = (
+                select(
+                    *columns,
+                    (-top.c.rank).label("score"),
+                    literal_column(
+                        f"snippet({NOTICE_FTS_TABLE}, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS})"
+                    ).label("snippet"),
+                )
+                .select_from(
+                    top.join(FTS_TABLE, FTS_TABLE.c.rowid == top.c.fts_rowid).join(
+                        Notice.__table__, Notice.id == FTS_TABLE.c.notice_id
+                    )
+                )
+                .where(match_clause)
+                .order_by(top.c.rank)
+            )
+        else:
+            if not query.strip():
+                return []
+            document = literal_column(PG_SEARCH_DOCUMENT)
+            tsquery = func.websearch_to_tsquery("english", query)
+            stmt = (
+                select(
+                    *columns,
+                    func.ts_rank(document, tsquery).label("score"),
+                    func.ts_headline(
+                        "english",
+                        func.concat_ws(" ", Notice.title, Notice.summary, Notice.description),
+                        tsquery,
+                        f"MaxWords={SNIPPET_TOKENS}, MinWords=5, StartSel=<mark>, StopSel=</mark>",
+                    ).label("snippet"),
+                )
+                .where(document.op("@@")(tsquery), *clauses)
+                .order_by(literal_column("score").desc())
+                .limit(limit)
+            )
+        with self.engine.connect() as connection:
+            return [
+                SearchHit(
+                    notice_id=row.id,
+                    title=row.title,
+                    agency=row.agency,
+                    deadline=row.deadline,
+                    fit_score=row.fit_score,
+                    score=float(row.score),
+                    snippet=row.snippet or "",
+                )
+                for row in connection.execute(stmt)
+            ]
 
     def fetch_all(self) -> List[Notice]:
+        return list(self.iter_notices(include_raw_json=True, include_embedding=True))
+
+    def record_run(
+        self,
+        started_at: Optional[datetime] = None,
+        changed: int = 0,
+        unchanged: int = 0,
+        archived: int = 0,
+    ) -> int:
+        """Mark a pipeline run as committed; readers caching notices reload on a new run id."""
+        with self.session_scope() as session:
+            run = PipelineRun(
+                started_at=started_at,
+                finished_at=datetime.utcnow(),
+                notices_changed=changed,
+                notices_unchanged=unchanged,
+                notices_archived=archived,
+            )
+            session.add(run)
+            session.flush()
+            return run.id
+
+    def latest_run(self) -> Optional[PipelineRun]:
         with self.session_scope() as session:
-            return session.query(Notice).order_by(Notice.fit_score.desc()).all()
+            return session.scalars(select(PipelineRun).order_by(PipelineRun.id.desc()).limit(1)).first()
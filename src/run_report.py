@@ -0,0 +1,69 @@
+"""Summary of one pipeline run (counts and per-stage timings), written for the API to expose."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_RUN_REPORT_PATH = "output/pipeline_run.json"
+
+
+@dataclass
+class RunReport:
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    finished_at: Optional[str] = None
+    duration_seconds: float = 0.0
+    # Notices per stage: searched, fetched, filtered, skipped_recent, embedded, stored, ...
+    notices: Dict[str, int] = field(default_factory=dict)
+    api_calls: int = 0
+    stages: Dict[str, float] = field(default_factory=dict)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block; repeated stages accumulate."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.notices[name] = self.notices.get(name, 0) + amount
+
+    def finish(self) -> "RunReport":
+        self.finished_at = datetime.now(timezone.utc).isoformat()
+        self.duration_seconds = time.perf_counter() - self._started
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("_started")
+        return data
+
+
+def write_run_report(report: RunReport, path: str = DEFAULT_RUN_REPORT_PATH) -> None:
+    """Write the report atomically so readers never see a partial file."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp")
+    tmp.write_text(json.dumps(report.to_dict(), indent=2), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def read_run_report(path: str = DEFAULT_RUN_REPORT_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as exc:
+        LOGGER.warning("Could not read pipeline run report %s: %s", path, exc)
+        return None
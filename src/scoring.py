@@ -97,26 +97,36 @@ def score_notice(
     return max(0, min(100, math.floor(score)))
 
 
-def should_filter(notice: Dict, profile: CompanyProfile) -> bool:
-    """Return True if notice should be excluded before scoring."""
+def filter_reason(notice: Dict, profile: CompanyProfile, partial: bool = False) -> Optional[str]:
+    """
+    Name of the first exclusion rule the notice fails, or None if it passes.
+
+    With ``partial`` (a search summary rather than the full notice), rules whose
+    fields are absent are skipped instead of counting as a mismatch.
+    """
     deadline_str = notice.get("deadline")
     if deadline_str:
         try:
             deadline = datetime.fromisoformat(deadline_str.replace("Z", "+00:00"))
             days_left = (deadline - datetime.now(timezone.utc)).days
             if days_left < profile.deadline_min_days:
-                return True
+                return "deadline"
         except ValueError:
             pass
 
-    if profile.preferred_procurement_types:
+    if profile.preferred_procurement_types and not (partial and notice.get("procurementType") is None):
         if notice.get("procurementType") not in profile.preferred_procurement_types:
-            return True
+            return "procurement_type"
 
     target_countries = set(profile.geographies.get("countries", []))
     if target_countries:
-        notice_countries = {c.get("countryCode") for c in notice.get("countries", []) if c.get("countryCode")}
+        notice_countries = {c.get("countryCode") for c in notice.get("countries") or [] if c.get("countryCode")}
         if notice_countries and not (notice_countries & target_countries):
-            return True
+            return "geography"
+
+    return None
 
-    return False
+
+def should_filter(notice: Dict, profile: CompanyProfile) -> bool:
+    """Return True if notice should be excluded before scoring."""
+    return filter_reason(notice, profile) is not None
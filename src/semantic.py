@@ -5,7 +5,7 @@ from __future__ import annotations
 
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
@@ -24,8 +24,11 @@ class SemanticMatch:
     doc_id: Optional[str]
     chunk_index: Optional[str]
     chunk_text: Optional[str]
+    page_start: Optional[str] = None
+    page_end: Optional[str] = None
+    also_in: List[Dict[str, str]] = field(default_factory=list)
 
-    def to_dict(self) -> Dict[str, Optional[str]]:
+    def to_dict(self) -> Dict[str, object]:
         return {
             "score": self.score,
             "sourceTitle": self.source_title,
@@ -34,6 +37,9 @@ class SemanticMatch:
             "docId": self.doc_id,
             "chunkIndex": self.chunk_index,
             "chunkText": self.chunk_text,
+            "pageStart": self.page_start,
+            "pageEnd": self.page_end,
+            "alsoIn": self.also_in,
         }
 
 
@@ -121,6 +127,16 @@ class SemanticMatcher:
                     doc_id=metadata.get("doc_id"),
                     chunk_index=metadata.get("chunk_index"),
                     chunk_text=metadata.get("chunk_text"),
+                    page_start=metadata.get("page_start"),
+                    page_end=metadata.get("page_end"),
+                    also_in=[
+                        {"docId": doc_id, "sourceUrl": url, "sourceTitle": title}
+                        for doc_id, url, title in zip(
+                            metadata.get("duplicate_doc_ids") or [],
+                            metadata.get("duplicate_source_urls") or [],
+                            metadata.get("duplicate_source_titles") or [],
+                        )
+                    ],
                 )
             )
         return matches
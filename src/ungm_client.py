@@ -16,6 +16,8 @@ class UNGMClient:
     def __init__(self, base_url: str, oauth_client):
         self.base_url = base_url.rstrip("/")
         self.oauth_client = oauth_client
+        # HTTP requests sent, retries included (reported in the pipeline run report).
+        self.request_count = 0
 
     def _headers(self) -> Dict[str, str]:
         return {
@@ -31,6 +33,7 @@ class UNGMClient:
         reraise=True,
     )
     def _post(self, path: str, json_payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.request_count += 1
         response = requests.post(
             f"{self.base_url}{path}",
             json=json_payload,
@@ -49,6 +52,7 @@ class UNGMClient:
         reraise=True,
     )
     def _get(self, path: str) -> Dict[str, Any]:
+        self.request_count += 1
         response = requests.get(
             f"{self.base_url}{path}",
             headers=self._headers(),
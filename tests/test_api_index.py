@@ -0,0 +1,118 @@
+from datetime import date
+
+import pytest
+
+from src.api.index import NoticeIndex, OpportunityQuery
+
+
+def records():
+    agencies = ["UNDP", "UNICEF", "WFP"]
+    return [
+        {
+            "id": f"N-{number:03d}",
+            "title": f"Notice {number}",
+            "agency": agencies[number % 3],
+            "countryCode": "KEN" if number % 2 else "UGA",
+            # Repeated scores and missing deadlines exercise the id tie-break.
+            "totalScore": (number * 7) % 50 + 50,
+            "deadline": f"2030-01-{number % 28 + 1:02d}" if number % 5 else None,
+            "searchEmbedding": [float(number), 1.0],
+        }
+        for number in range(60)
+    ]
+
+
+def page_through(index: NoticeIndex, **kwargs):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = index.query(OpportunityQuery.build(cursor=cursor, **kwargs))
+        seen.extend(notice["id"] for notice in page["notices"])
+        pages += 1
+        cursor = page["nextCursor"]
+        if cursor is None:
+            return seen, page["total"], pages
+
+
+def expected_ids(rows, sort="totalScore", order=None, keep=lambda record: True):
+    rows = [record for record in rows if keep(record)]
+    if sort == "totalScore":
+        rows.sort(key=lambda record: (-record["totalScore"], record["id"]))
+        ascending = order == "asc"
+    else:
+        rows.sort(key=lambda record: (record["deadline"] is None, record["deadline"] or "", record["id"]))
+        ascending = order != "desc"
+    ids = [record["id"] for record in rows]
+    return ids if ascending != (sort == "totalScore") else ids[::-1]
+
+
+@pytest.mark.parametrize(
+    "sort, order",
+    [("totalScore", None), ("totalScore", "asc"), ("deadline", None), ("deadline", "desc")],
+)
+def test_cursor_pages_cover_every_match_once_in_order(sort, order):
+    rows = records()
+    index = NoticeIndex(rows)
+
+    seen, total, pages = page_through(index, sort=sort, order=order, limit=7)
+
+    assert seen == expected_ids(rows, sort, order)
+    assert total == len(rows)
+    assert pages == 9
+
+
+def test_filters_are_anded_and_values_ored():
+    rows = records()
+    index = NoticeIndex(rows)
+
+    seen, total, _ = page_through(
+        index,
+        agency="undp,WFP",
+        country="ken",
+        min_score=70,
+        deadline_from=date(2030, 1, 5),
+        deadline_to=date(2030, 1, 20),
+        limit=4,
+    )
+
+    def keep(record):
+        return (
+            record["agency"] in ("UNDP", "WFP")
+            and record["countryCode"] == "KEN"
+            and record["totalScore"] >= 70
+            and record["deadline"] is not None
+            and "2030-01-05" <= record["deadline"] <= "2030-01-20"
+        )
+
+    assert seen == expected_ids(rows, keep=keep)
+    assert total == len(seen) > 0
+
+
+def test_projection_and_embedding_exclusion():
+    index = NoticeIndex(records())
+
+    default = index.query(OpportunityQuery.build(limit=1))["notices"][0]
+    projected = index.query(OpportunityQuery.build(limit=1, fields="title,searchEmbedding"))["notices"][0]
+
+    assert "searchEmbedding" not in default
+    assert set(projected) == {"id", "title", "searchEmbedding"}
+
+
+def test_cursor_is_bound_to_its_sort_order():
+    index = NoticeIndex(records())
+    cursor = index.query(OpportunityQuery.build(limit=5))["nextCursor"]
+
+    with pytest.raises(ValueError):
+        index.query(OpportunityQuery.build(cursor=cursor, sort="deadline"))
+    with pytest.raises(ValueError):
+        index.query(OpportunityQuery.build(cursor="not-a-cursor"))
+
+
+def test_facets_ignore_their_own_filter():
+    rows = records()
+    index = NoticeIndex(rows)
+
+    facets = index.facets(OpportunityQuery.build(agency="undp"))
+
+    assert facets["total"] == sum(1 for record in rows if record["agency"] == "UNDP")
+    counts = {item["value"]: item["count"] for item in facets["facets"]["agency"]}
+    assert counts == {"UNDP": 20, "UNICEF": 20, "WFP": 20}
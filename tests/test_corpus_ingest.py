@@ -0,0 +1,118 @@
+from pathlib import Path
+
+import pytest
+import tiktoken
+
+from src import corpus_ingest
+from src.corpus_ingest import IngestManifest, SourceDocument, chunk_spans, ingest_params, plan_ingest
+
+PARAMS = ingest_params(max_tokens=40, overlap_tokens=10, embedding_model="test-model")
+
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    """One token per byte, so chunking is testable without downloading a BPE file."""
+    encoding = tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"[\s\S]",
+        mergeable_ranks={bytes([value]): value for value in range(256)},
+        special_tokens={},
+    )
+    monkeypatch.setattr(corpus_ingest, "get_encoding", lambda name=None: encoding)
+    return encoding
+
+
+def source(doc_id: str, content_hash: str) -> SourceDocument:
+    return SourceDocument(
+        doc_id=doc_id,
+        path=Path(f"{doc_id}.txt"),
+        source_type="publication_article",
+        metadata={"source_path": f"{doc_id}.txt"},
+        content_hash=content_hash,
+    )
+
+
+def recorded(manifest: IngestManifest, doc: SourceDocument, chunk_ids, aliases=None) -> None:
+    manifest.record(doc, PARAMS, list(chunk_ids), aliases=aliases)
+
+
+def test_plan_ingest_new_manifest_ingests_everything(tmp_path):
+    sources = [source("a", "h1"), source("b", "h2")]
+    pending, removed = plan_ingest(sources, IngestManifest(path=tmp_path / "m.json"), PARAMS)
+    assert [doc.doc_id for doc in pending] == ["a", "b"]
+    assert removed == []
+
+
+def test_plan_ingest_skips_unchanged_and_reports_changed_and_removed(tmp_path):
+    manifest = IngestManifest(path=tmp_path / "m.json")
+    for doc_id, content_hash in (("a", "h1"), ("b", "h2"), ("gone", "h3")):
+        recorded(manifest, source(doc_id, content_hash), [f"{doc_id}-0"])
+
+    pending, removed = plan_ingest([source("a", "h1"), source("b", "changed")], manifest, PARAMS)
+
+    assert [doc.doc_id for doc in pending] == ["b"]
+    assert removed == ["gone"]
+
+
+def test_plan_ingest_changed_params_or_full_reingests(tmp_path):
+    manifest = IngestManifest(path=tmp_path / "m.json")
+    recorded(manifest, source("a", "h1"), ["a-0"])
+
+    other = ingest_params(max_tokens=80, overlap_tokens=10, embedding_model="test-model")
+    assert [doc.doc_id for doc in plan_ingest([source("a", "h1")], manifest, other)[0]] == ["a"]
+    assert [doc.doc_id for doc in plan_ingest([source("a", "h1")], manifest, PARAMS, full=True)[0]] == ["a"]
+
+
+def test_plan_ingest_resumes_incomplete_document(tmp_path):
+    manifest = IngestManifest(path=tmp_path / "m.json")
+    doc = source("a", "h1")
+    manifest.checkpoint(doc, PARAMS, ["a-0"])
+
+    pending, _ = plan_ingest([source("a", "h1")], manifest, PARAMS)
+
+    assert [item.doc_id for item in pending] == ["a"]
+    assert manifest.resume_ids(doc, PARAMS) == {"a-0"}
+
+
+def test_plan_ingest_marks_byte_identical_copies(tmp_path):
+    sources = [source("a", "same"), source("b", "same"), source("c", "other")]
+    pending, _ = plan_ingest(sources, IngestManifest(path=tmp_path / "m.json"), PARAMS)
+    assert {doc.doc_id: doc.duplicate_of for doc in pending} == {"a": None, "b": "a", "c": None}
+
+
+def test_plan_ingest_reprocesses_documents_aliased_to_dirty_chunks(tmp_path):
+    manifest = IngestManifest(path=tmp_path / "m.json")
+    recorded(manifest, source("a", "h1"), ["a-0", "a-1"])
+    # b's chunk was folded into a-1; c is unrelated.
+    recorded(manifest, source("b", "h2"), ["b-1"], aliases={"b-0": "a-1"})
+    recorded(manifest, source("c", "h3"), ["c-0"])
+
+    pending, _ = plan_ingest([source("a", "changed"), source("b", "h2"), source("c", "h3")], manifest, PARAMS)
+
+    assert [doc.doc_id for doc in pending] == ["a", "b"]
+
+
+def test_chunk_spans_windows_overlap_and_slice_the_source(byte_encoding):
+    pages = ["a" * 50, "b" * 30]
+    text = "\n".join(pages)
+
+    spans = chunk_spans(pages, max_tokens=40, overlap_tokens=10)
+
+    assert [(span.token_start, span.token_end) for span in spans] == [(0, 40), (30, 70), (60, 81)]
+    for span in spans:
+        assert span.text == text[span.char_start : span.char_end]
+        assert span.token_count == span.token_end - span.token_start == len(span.tokens)
+    assert [(span.page_start, span.page_end) for span in spans] == [(1, 1), (1, 2), (2, 2)]
+
+
+def test_chunk_spans_strips_whitespace_and_skips_blank_windows(byte_encoding):
+    spans = chunk_spans(["  hello  ", " " * 20], max_tokens=8, overlap_tokens=0)
+
+    assert [span.text for span in spans] == ["hello"]
+    assert (spans[0].char_start, spans[0].char_end) == (2, 7)
+
+
+def test_chunk_spans_empty_and_invalid(byte_encoding):
+    assert chunk_spans([""], max_tokens=10, overlap_tokens=2) == []
+    with pytest.raises(ValueError):
+        chunk_spans(["text"], max_tokens=10, overlap_tokens=10)
@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from src.api.index import NoticeColumns, OpportunityQuery
+from src.api.packed import MAGIC, PackedFormatError, PackedSnapshotFile, write_packed_snapshot
+from src.api.snapshot import NoticeSnapshot
+
+
+def records():
+    rows = [
+        {
+            "id": f"N-{number}",
+            "title": f"Notice {number} – café",
+            "agency": ["UNDP", "WFP"][number % 2],
+            "countries": [{"countryCode": "KEN", "country": "Kenya"}, {"countryCode": "UGA", "country": "Uganda"}][
+                : number % 2 + 1
+            ],
+            "totalScore": 40 + number * 5,
+            "deadline": f"2030-02-{number + 1:02d}" if number != 3 else None,
+            "searchEmbedding": [float(number + 1), 2.0, 0.5],
+        }
+        for number in range(6)
+    ]
+    del rows[4]["searchEmbedding"]
+    rows.append({})
+    return rows
+
+
+@pytest.fixture
+def packed(tmp_path):
+    rows = records()
+    path = write_packed_snapshot(rows, str(tmp_path / "notices.snapshot"), run_id=7)
+    return rows, PackedSnapshotFile(path)
+
+
+def test_header_and_columns_round_trip(packed):
+    rows, packed_file = packed
+
+    assert packed_file.header["count"] == len(rows)
+    assert packed_file.header["run_id"] == 7
+    assert packed_file.columns() == NoticeColumns.from_records(rows)
+
+
+def test_records_feed_and_gzip_round_trip(packed):
+    rows, packed_file = packed
+    snapshot = packed_file.snapshot()
+
+    assert list(snapshot.notices) == rows
+    assert json.loads(bytes(snapshot.feed.raw)) == {"notices": rows}
+    assert gzip.decompress(bytes(snapshot.feed.gzipped)) == bytes(snapshot.feed.raw)
+    summaries = list(snapshot.index.summaries)
+    assert summaries == [{key: value for key, value in row.items() if key != "searchEmbedding"} for row in rows]
+
+
+def test_packed_snapshot_answers_like_one_built_from_records(packed):
+    rows, packed_file = packed
+    mapped = packed_file.snapshot()
+    built = NoticeSnapshot(rows)
+
+    for query in (
+        OpportunityQuery.build(limit=2),
+        OpportunityQuery.build(sort="deadline", country="uga"),
+        OpportunityQuery.build(min_score=50, fields="title,searchEmbedding"),
+    ):
+        assert mapped.index.query(query) == built.index.query(query)
+    assert mapped.index.facets(OpportunityQuery()) == built.index.facets(OpportunityQuery())
+    assert mapped.embeddings.ids == built.embeddings.ids
+    assert np.array_equal(mapped.embeddings.matrix, built.embeddings.matrix)
+
+
+def test_rejects_foreign_or_mismatched_files(tmp_path, packed):
+    _, packed_file = packed
+    foreign = tmp_path / "foreign.snapshot"
+    foreign.write_bytes(b"not a snapshot at all")
+    with pytest.raises(PackedFormatError):
+        PackedSnapshotFile(foreign)
+
+    header = json.dumps({**packed_file.header, "version": 999}).encode("utf-8")
+    future = tmp_path / "future.snapshot"
+    future.write_bytes(MAGIC + len(header).to_bytes(8, "little") + header)
+    with pytest.raises(PackedFormatError):
+        PackedSnapshotFile(future)
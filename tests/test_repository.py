@@ -0,0 +1,123 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import JSON, MetaData, create_engine, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.migrations import MIGRATIONS, schema_migrations
+from src.models import Notice, NoticeCountry, NoticeDocument
+from src.repository import NoticeRepository
+
+
+def make_notice(number: int, score: int = 50) -> Notice:
+    notice_id = f"N-{number:03d}"
+    notice = Notice(
+        id=notice_id,
+        title=f"Audit services {number}",
+        summary="Financial audit",
+        description="Audit of programme accounts",
+        agency="UNDP",
+        deadline=date(2030, 1, 1),
+        status="Published",
+        raw_json={"id": notice_id, "title": f"Audit services {number}"},
+        fit_score=score,
+        search_embedding=[0.25, 0.5, 1.0],
+    )
+    notice.documents = [NoticeDocument(notice_id=notice_id, url=f"https://example.org/{notice_id}.pdf", name="ToR")]
+    notice.countries = [NoticeCountry(notice_id=notice_id, country_code="KEN", country_name="Kenya")]
+    return notice
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = NoticeRepository(f"sqlite:///{tmp_path / 'notices.db'}")
+    yield repository
+    repository.engine.dispose()
+
+
+def updated_at(repository: NoticeRepository):
+    with repository.engine.connect() as connection:
+        return dict(connection.execute(select(Notice.__table__.c.id, Notice.__table__.c.updated_at)).all())
+
+
+def test_upsert_skips_unchanged_notices(repository):
+    first = repository.upsert_notices([make_notice(number) for number in range(5)], batch_size=2)
+    assert [timing.changed for timing in first] == [2, 2, 1]
+    stamps = updated_at(repository)
+
+    again = repository.upsert_notices([make_notice(number) for number in range(5)], batch_size=2)
+
+    assert sum(timing.changed for timing in again) == 0
+    assert sum(timing.unchanged for timing in again) == 5
+    assert updated_at(repository) == stamps
+
+
+def test_upsert_writes_only_changed_notices_and_children(repository):
+    repository.upsert_notices([make_notice(number) for number in range(3)])
+    stamps = updated_at(repository)
+
+    rescored = make_notice(1, score=90)
+    moved = make_notice(2)
+    moved.countries = [NoticeCountry(notice_id=moved.id, country_code="UGA", country_name="Uganda")]
+    (timing,) = repository.upsert_notices([make_notice(0), rescored, moved])
+
+    assert (timing.notices, timing.unchanged, timing.changed) == (3, 1, 2)
+    assert (timing.child_rows_inserted, timing.child_rows_deleted) == (1, 1)
+    after = updated_at(repository)
+    assert after["N-000"] == stamps["N-000"]
+    assert after["N-001"] != stamps["N-001"]
+    stored = {notice.id: notice for notice in repository.fetch_all()}
+    assert stored["N-001"].fit_score == 90
+    assert [country.country_code for country in stored["N-002"].countries] == ["UGA"]
+    assert stored["N-000"].raw_json == {"id": "N-000", "title": "Audit services 0"}
+    assert stored["N-000"].search_embedding == [0.25, 0.5, 1.0]
+
+
+def test_search_index_follows_upserts(repository):
+    repository.upsert_notices([make_notice(number) for number in range(3)])
+    renamed = make_notice(1)
+    renamed.title = "Solar pumping systems"
+    repository.upsert_notices([renamed])
+
+    assert [hit.notice_id for hit in repository.search("solar")] == ["N-001"]
+    assert {hit.notice_id for hit in repository.search("audit")} == {"N-000", "N-001", "N-002"}
+
+
+def test_migrations_upgrade_a_legacy_json_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    legacy = Notice.__table__.to_metadata(MetaData())
+    legacy.c.raw_json.type = JSON()
+    legacy.c.search_embedding.type = JSON()
+    engine = create_engine(url)
+    legacy.create(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(legacy).values(
+                id="OLD-1",
+                title="Road rehabilitation",
+                raw_json={"id": "OLD-1"},
+                search_embedding=[0.1, 0.2],
+            )
+        )
+    engine.dispose()
+
+    repository = NoticeRepository(url)
+    try:
+        (notice,) = repository.fetch_all()
+        with repository.engine.connect() as connection:
+            revisions = set(connection.execute(select(schema_migrations.c.revision)).scalars())
+        assert notice.raw_json == {"id": "OLD-1"}
+        assert notice.search_embedding == pytest.approx([0.1, 0.2])
+        assert revisions == {revision for revision, _ in MIGRATIONS}
+        assert [hit.notice_id for hit in repository.search("road")] == ["OLD-1"]
+    finally:
+        repository.engine.dispose()
+
+
+def test_read_only_repository_never_creates_the_database(tmp_path):
+    path = tmp_path / "missing.db"
+    repository = NoticeRepository(f"sqlite:///{path}", read_only=True)
+
+    with pytest.raises(SQLAlchemyError):
+        repository.latest_run()
+    assert not path.exists()